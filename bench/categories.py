@@ -0,0 +1,108 @@
+"""Benchmarks category matching with trie patterns against flat alternations.
+
+Matches a large category of multigraph consonants in many words, and applies
+a few rules using it to each word, once with categories expanded by
+sound_changer.trie_pattern, and once with the flat, longest first alternation
+used before it, and checks that the results are the same.
+
+Run from the directory containing soundchanger:
+
+    $ python3 -m soundchanger.bench.categories
+"""
+import argparse
+import random
+import regex
+import time
+from soundchanger.conlang import sound_changer
+
+
+def consonants():
+    """Returns a list of 99 consonants, most of them multigraphs."""
+    out = []
+    for base in 'ptkbdgmnszfvlrw':
+        out += [base, base + 'h', base + 'ʲ', base + 'ʷ', base + 'ː']
+    for base in 'ptkbdg':
+        out += [base + 's', base + 'ʃ', base + 'sʰ', base + 'ʃʰ']
+    return out
+
+
+def rules():
+    """Returns the rule lines used by the benchmark."""
+    return [
+        'C = ' + ' '.join(consonants()),
+        'V = a e i o u',
+        '{C} > {C} / {V}_{V}',
+        '{1:C}{1:C} > {1:C}',
+        'ts > tʃ / _{V}',
+        '{C} > 0 / _#',
+        'h > 0 / {C}_',
+        '{V}{C}{V} > {V}{C}ə',
+    ]
+
+
+def words(n, seed=0):
+    """Generates n random words from the consonants and vowels."""
+    rng = random.Random(seed)
+    cs = consonants()
+    return [''.join(rng.choice(cs) + rng.choice('aeiou')
+                    for _ in range(rng.randint(2, 8)))
+            for _ in range(n)]
+
+
+def flat_pattern(items):
+    """Generates a flat alternation of items, longest first."""
+    return '|'.join(sorted(items, key=len, reverse=True))
+
+
+def compile_all(word_list):
+    """Compiles the category and the rules, with the current trie_pattern.
+
+    Returns:
+        A dict of functions to time, with the keys 'match', for finding every
+        consonant followed by a vowel in the words joined together, and
+        'apply', for applying the compiled rules to each word.
+    """
+    text = ' '.join(word_list)
+    pattern = sound_changer.Category(consonants()).pattern
+    matcher = regex.compile('(?:' + pattern + ')[aeiou]')
+    compiled = sound_changer.CompiledRuleList(rules())
+    return {
+        'match': lambda: matcher.findall(text),
+        'apply': lambda: [compiled.apply(w) for w in word_list],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--words', '-n', type=int, default=10000)
+    parser.add_argument('--repeat', '-r', type=int, default=7)
+    args = parser.parse_args()
+    word_list = words(args.words)
+    versions = {'trie': compile_all(word_list)}
+    trie = sound_changer.trie_pattern
+    sound_changer.trie_pattern = flat_pattern
+    try:
+        versions['flat'] = compile_all(word_list)
+    finally:
+        sound_changer.trie_pattern = trie
+    print('{} consonants, {} words'.format(len(consonants()), args.words))
+    print('{:<8}{:>10}{:>10}{:>10}'.format('', 'flat', 'trie', 'speed-up'))
+    for key in ['match', 'apply']:
+        best = {}
+        results = {}
+        # alternate between the versions, so that they are timed under the
+        # same conditions
+        for _ in range(args.repeat):
+            for name, functs in versions.items():
+                start = time.perf_counter()
+                results[name] = functs[key]()
+                elapsed = time.perf_counter() - start
+                best[name] = min(best.get(name, elapsed), elapsed)
+        print('{:<8}{:>9.3f}s{:>9.3f}s{:>9.2f}x'.format(
+            key, best['flat'], best['trie'], best['flat'] / best['trie']))
+        if results['flat'] != results['trie']:
+            raise SystemExit('the results of {} differ'.format(key))
+
+
+if __name__ == '__main__':
+    main()
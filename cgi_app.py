@@ -9,11 +9,14 @@ from soundchanger.conlang import sound_changer, workers
 
 
 FILE_PATH = os.path.abspath(os.path.dirname(sys.argv[0]))
+# The maximum number of words to keep the results of, when reading from stdin
+CACHE_SIZE = 10000
 
 def main():
     word = None
     stdin = False
     html = False
+    stats = False
     debug = 0
     if 'REQUEST_METHOD' in os.environ:
         # It's being run as a cgi script
@@ -22,25 +25,7 @@ def main():
         print('Content-Type: text/html')
         print('')
         form = cgi.FieldStorage(encoding='utf-8')
-        word = form['word'].value
-        startd = {}
-        endd = {}
-        for f in form:
-            try:
-                # just get the number from the form key
-                n = int(f.split('-')[1])
-                v = form[f].value
-                if f[0] == 's':
-                    startd[n] = v if v != ' ' else ''
-                elif f[0] == 'e':
-                    endd[n] = v if v != ' ' else ''
-            except IndexError:
-                # there wasn't a '-' in f, so it wasn't a start or end key
-                continue
-        start = [v for k, v in sorted(startd.items())]
-        end = [v for k, v in sorted(endd.items())]
-        if 'debug' in form:
-            debug = int(form['debug'].value)
+        word, pairs, debug = parse_form({f: form[f].value for f in form})
         html = True
     else:
         # It's being run from the command line
@@ -50,18 +35,21 @@ def main():
         parser.add_argument('--end', '-e', action='append', default=[], nargs='?')
         parser.add_argument('--debug', '-d', type=int, default=0)
         parser.add_argument('--html', '-t', action='store_true')
+        parser.add_argument('--stats', action='store_true')
         args = parser.parse_args()
         word = args.word
         if word is None:
             # take input from stdin
             stdin = True
         debug = args.debug
+        stats = args.stats
         if args.html:
             # encode all non-ascii characters with xml escapes
-            sys.stdout = Reencoder(sys.stdout)
+            sys.stdout = workers.Reencoder(sys.stdout)
             html = True
         start = [x if x else '' for x in args.start]
         end = [x if x else '' for x in args.end]
+        pairs = list(zip(start, end))
 
     if html:
         # html formatted error messages
@@ -70,23 +58,95 @@ def main():
         # plain error messages
         cgitb.enable(format='plain')
 
-    pairs = list(zip(start, end))
+    # the rule files are only loaded once, even when reading from stdin
+    words = read_words() if stdin else [word]
+    results = sound_changer.SoundChangeCache(CACHE_SIZE, -1, CACHE_SIZE)
+    if debug:
+        outputs = sound_changer.apply_rule_files_many(words, pairs, debug,
+                                                      results.file_cache)
+    else:
+        # repeated words are looked up in the cache
+        pairs = tuple(tuple(p) for p in pairs)
+        outputs = ((results(word, pairs), '') for word in words)
+    for word, db in outputs:
+        print(render(word, db, html), end='')
+    if stats:
+        for name, c in [('results', results), ('stages', results.stage_cache),
+                        ('files', results.file_cache)]:
+            print(format_stats(name, c.stats()), file=sys.stderr)
+
+
+def format_stats(name, stats):
+    """Formats the statistics of a cache as a line of text.
+
+    Args:
+        name: The name of the cache.
+        stats: The dict returned by the cache's stats method.
+
+    Returns:
+        The name, followed by each statistic.
+    """
+    return name + ': ' + ' '.join('{}={:.4g}'.format(k, v) if
+                                  isinstance(v, float) else
+                                  '{}={}'.format(k, v)
+                                  for k, v in stats.items())
+
+
+def parse_form(form):
+    """Gets the parameters of a request from the form.
+
+    Args:
+        form: A dict of the form keys and values. 'word' is the word, 'debug'
+            (optional) is the debug level, and 'start-N' and 'end-N' are the
+            start and end of the Nth pair, where ' ' stands for ''.
+
+    Returns:
+        A tuple of the word, the list of pairs, and the debug level.
+    """
+    startd = {}
+    endd = {}
+    for f, v in form.items():
+        try:
+            # just get the number from the form key
+            n = int(f.split('-')[1])
+            if f[0] == 's':
+                startd[n] = v if v != ' ' else ''
+            elif f[0] == 'e':
+                endd[n] = v if v != ' ' else ''
+        except IndexError:
+            # there wasn't a '-' in f, so it wasn't a start or end key
+            continue
+    start = [v for k, v in sorted(startd.items())]
+    end = [v for k, v in sorted(endd.items())]
+    debug = int(form['debug']) if 'debug' in form else 0
+    return form['word'], list(zip(start, end)), debug
+
+
+def render(word, db, html=False):
+    """Formats the result of a sound change for output.
+
+    Args:
+        word: The result of the sound change.
+        db: The debug info.
+        html: (Optional) Whether to wrap the output in a <pre> element.
+            Defaults to False.
+
+    Returns:
+        The output, as a string.
+    """
+    out = word + '\n' + db
+    if html:
+        out = '<pre>\n' + out + '</pre>\n'
+    return out
+
 
+def read_words():
+    """Yields lines from stdin until EOF or a keyboard interrupt."""
     while True:
-        if stdin:
-            try:
-                word = input()
-            except (KeyboardInterrupt, EOFError):
-                break
-        word, db = sound_changer.apply_rule_files(word, pairs, debug)
-        if html:
-            print('<pre>')
-        print(word)
-        print(db, end='')
-        if html:
-            print('</pre>')
-        if not stdin:
-            break
+        try:
+            yield input()
+        except (KeyboardInterrupt, EOFError):
+            return
 
 if __name__ == '__main__':
     main()
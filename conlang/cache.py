@@ -1,32 +1,206 @@
+import collections
+import concurrent.futures
+import contextlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
 import time
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+# The default number of seconds a file's modification time is trusted for,
+# before it is checked again.
+REVALIDATE_INTERVAL = 1
+
+
+class MTimeSnapshot(object):
+    """A snapshot of the modification times of files.
+
+    A file's modification time is only checked again once it is older than
+    interval. If a directory is being watched (which requires the
+    inotify_simple module), the modification times of files in it are trusted
+    until the watcher sees them change.
+
+    Attributes:
+        interval: The number of seconds a modification time is trusted for.
+        times: A dict whose keys are file paths, and whose values are tuples of
+            the time the file was last checked, and its modification time.
+        watched: A set of the directories being watched.
+    """
+    def __init__(self, interval=REVALIDATE_INTERVAL):
+        """Initializes a snapshot.
+
+        Args:
+            interval: (Optional) The number of seconds a modification time is
+                trusted for. Defaults to REVALIDATE_INTERVAL.
+        """
+        self.interval = interval
+        self.times = {}
+        self.watched = set()
+        self._watch_pid = None
+
+    def getmtime(self, filename):
+        """Returns the modification time of a file.
+
+        Args:
+            filename: The path to the file.
+
+        Returns:
+            The modification time of the file, as returned by
+            os.path.getmtime, or as it was at most interval seconds ago.
+        """
+        now = time.time()
+        entry = self.times.get(filename)
+        if entry is not None and (now - entry[0] < self.interval or
+                                  self.is_watched(filename)):
+            return entry[1]
+        mtime = os.path.getmtime(filename)
+        self.times[filename] = now, mtime
+        return mtime
+
+    def invalidate(self, filename=None):
+        """Forgets the modification time of a file.
+
+        Args:
+            filename: (Optional) The path to the file. If None (default), all
+                modification times are forgotten.
+        """
+        if filename is None:
+            self.times.clear()
+        else:
+            self.times.pop(filename, None)
+
+    def is_watched(self, filename):
+        """Checks whether a file is in a directory being watched."""
+        # the watcher thread doesn't survive a fork
+        return (self._watch_pid == os.getpid() and
+                os.path.dirname(filename) in self.watched)
+
+    def watch(self, directory):
+        """Starts watching a directory for changes.
+
+        Args:
+            directory: The path to the directory.
+
+        Returns:
+            True if the directory is being watched, or False if it can't be,
+            because inotify_simple isn't available.
+        """
+        if inotify_simple is None:
+            return False
+        directory = os.path.normpath(directory)
+        if self._watch_pid != os.getpid():
+            # a new process, so previous watches are gone
+            self.watched = set()
+            self._watch_pid = os.getpid()
+        if directory in self.watched:
+            return True
+        flags = inotify_simple.flags
+        inotify = inotify_simple.INotify()
+        inotify.add_watch(directory, flags.MODIFY | flags.ATTRIB |
+                          flags.CLOSE_WRITE | flags.CREATE | flags.DELETE |
+                          flags.MOVED_FROM | flags.MOVED_TO)
+
+        def run():
+            while True:
+                for event in inotify.read():
+                    self.invalidate(os.path.join(directory, event.name))
+
+        # anything cached before the watch started may be out of date
+        for f in list(self.times):
+            if os.path.dirname(f) == directory:
+                self.invalidate(f)
+        threading.Thread(target=run, daemon=True).start()
+        self.watched.add(directory)
+        return True
+
+
+# The modification times shared by every cache in the process
+mtimes = MTimeSnapshot()
+
+
+def estimate_size(obj):
+    """Estimates the memory used by an object, in bytes.
+
+    Lists, tuples, sets and dicts are measured along with their contents.
+    Anything else is measured with sys.getsizeof, so classes can give a better
+    estimate of their own size by defining __sizeof__.
+
+    Args:
+        obj: The object to measure.
+
+    Returns:
+        The estimated size of obj, in bytes.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(x) for x in obj)
+    elif isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v)
+                    for k, v in obj.items())
+    return size
+
 
 class Cache(object):
     """A cache of computed values.
 
     Attributes:
-        cache: The cache as a dict, whose keys are the arguments to the
+        cache: The cache as an OrderedDict, whose keys are the arguments to the
             function the cache computes, and whose values are tuples of the
-            last modified time, and the result of the funciton.
+            last modified time, and the result of the funciton. It is ordered
+            from least to most recently used.
         funct: The function whose results the cache stores.
         max_size: An int. If the cache has more than max_size entries, the
-            oldest entries are purged. If set to -1, the cache has unlimited
-            size.
-        mod_times: A list of keys, in order of last modification time, oldest
-            first.
+            least recently used entries are purged. If set to -1, the cache has
+            unlimited size.
+        max_bytes: An int. If the estimated size of the cache's keys and
+            values is more than max_bytes, the least recently used entries are
+            purged. If set to -1, the cache has unlimited size.
+        sizeof: The function used to estimate the size of keys and values.
+        nbytes: The estimated size of the cache's keys and values, in bytes.
+        thread_safe: Whether the cache can be used from several threads at
+            once. If so, concurrent calls with the same arguments wait for a
+            single call of funct, rather than each calling it.
+        mod_times: A list of keys, in order of last use, least recent first.
+        hits: The number of calls answered from the cache.
+        misses: The number of calls whose arguments weren't in the cache.
+        stale: The number of calls whose cached value was out of date.
+        evictions: The number of entries purged to keep the cache within
+            max_size or max_bytes.
+        compute_time: The total number of seconds spent in funct.
     """
-    def __init__(self, funct, max_size=-1):
+    def __init__(self, funct, max_size=-1, max_bytes=-1,
+                 sizeof=estimate_size, thread_safe=False):
         """Initializes a cache.
 
         Args:
             funct: The function whose results the cache stores.
             max_size: (Optional) The maximum number of entries in the cache. If
                 set to -1 (default), the cache has no limit.
+            max_bytes: (Optional) The maximum estimated size of the cache, in
+                bytes. If set to -1 (default), the cache has no limit.
+            sizeof: (Optional) The function used to estimate the size of keys
+                and values. Defaults to estimate_size.
+            thread_safe: (Optional) Whether the cache can be used from several
+                threads at once. Defaults to False.
         """
         super().__init__()
-        self.cache = {}
+        self.cache = collections.OrderedDict()
         self.funct = funct
         self.max_size = max_size
-        self.mod_times = []
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._sizes = {}
+        self.thread_safe = thread_safe
+        self._lock = threading.RLock() if thread_safe else None
+        # futures for the values currently being computed, by key
+        self._pending = {}
+        self.reset_stats()
 
     def __call__(self, *args):
         """Calls the function or returns a cached value.
@@ -41,11 +215,66 @@ class Cache(object):
         Returns:
             The result of the function or a cached value.
         """
-        if args not in self.cache:
-            # it's not cached, so cache it
-            self.update(*args)
-        # retrieve cached value. if it wasn't already cached, it is now
-        return self.cache[args][1]
+        if self._lock is None:
+            found, value = self.lookup(args)
+            return value if found else self.update(*args)
+        with self._lock:
+            found, value = self.lookup(args)
+            if found:
+                return value
+            future = self._pending.get(args)
+            if future is None:
+                # nobody else is computing it, so this thread will
+                future = self._pending[args] = concurrent.futures.Future()
+                computing = True
+            else:
+                computing = False
+        if not computing:
+            # wait for the thread that is computing it
+            return future.result()
+        try:
+            t, value = self.compute(*args)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[args]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self.store(args, t, value)
+            del self._pending[args]
+        future.set_result(value)
+        return value
+
+    def _locked(self):
+        """Returns the cache's lock, or a dummy one if it isn't thread safe."""
+        if self._lock is None:
+            return contextlib.nullcontext()
+        return self._lock
+
+    @property
+    def mod_times(self):
+        with self._locked():
+            return list(self.cache)
+
+    def lookup(self, args):
+        """Looks up a value in the cache, without computing it.
+
+        Args:
+            args: The tuple of arguments to look up.
+
+        Returns:
+            A tuple of whether a usable value was found, and the value (or None
+            if it wasn't).
+        """
+        try:
+            value = self.cache[args][1]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        # it's now the most recently used entry
+        self.cache.move_to_end(args)
+        self.hits += 1
+        return True, value
 
     def purge(self, num=-1):
         """Purges the cache.
@@ -53,86 +282,314 @@ class Cache(object):
         Args:
             num: (Optional) The number of entries to purge. If set to -1
                 (default), all entries are purged. Otherwise, num entries are
-                purged, starting with the oldest.
+                purged, starting with the least recently used.
         """
-        if num == -1:
-            num = len(self.cache)
-        for k in self.mod_times[:num]:
-            del self.cache[k]
-        self.update_mod_times
+        with self._locked():
+            if num == -1:
+                self.cache.clear()
+                self._sizes.clear()
+                self.nbytes = 0
+                return
+            for _ in range(min(num, len(self.cache))):
+                key, _ = self.cache.popitem(last=False)
+                self.nbytes -= self._sizes.pop(key)
+                self.evictions += 1
 
     def update(self, *args):
         """Updates a value in the cache.
 
-        If the value is not in the cache already, and adding it causes the
-        cache to excede max_size, the oldest entry is purged from the cache.
+        If adding the value causes the cache to excede max_size or max_bytes,
+        the least recently used entries are purged from the cache.
+
+        Args:
+            *args: The arguments to self.funct.
+
+        Returns:
+            The result of the function.
+        """
+        t, value = self.compute(*args)
+        with self._locked():
+            self.store(args, t, value)
+        return value
+
+    def compute(self, *args):
+        """Calls the function.
 
         Args:
             *args: The arguments to self.funct.
+
+        Returns:
+            A tuple of the time the function was called, and its result.
+        """
+        t = time.time()
+        start = time.perf_counter()
+        value = self.funct(*args)
+        elapsed = time.perf_counter() - start
+        with self._locked():
+            self.compute_time += elapsed
+        return t, value
+
+    def store(self, args, t, value):
+        """Adds a computed value to the cache.
+
+        If adding the value causes the cache to excede max_size or max_bytes,
+        the least recently used entries are purged from the cache.
+
+        Args:
+            args: The tuple of arguments the value was computed from.
+            t: The time the value was computed.
+            value: The value.
         """
-        self.cache[args] = time.time(), self.funct(*args)
+        self.cache[args] = t, value
+        self.cache.move_to_end(args)
+        size = self.sizeof(args) + self.sizeof(value)
+        self.nbytes += size - self._sizes.get(args, 0)
+        self._sizes[args] = size
         if self.max_size != -1 and len(self.cache) > self.max_size:
             self.purge(len(self.cache) - self.max_size)
-        else:
-            # self.update_mod_times() is called by self.purge(), so we only
-            # need to call it if self.purge() isn't called.
-            self.update_mod_times()
+        if self.max_bytes != -1:
+            while self.nbytes > self.max_bytes and self.cache:
+                self.purge(1)
+
+    def reset_stats(self):
+        """Resets the counts returned by stats to zero."""
+        with self._locked():
+            self.hits = 0
+            self.misses = 0
+            self.stale = 0
+            self.evictions = 0
+            self.compute_time = 0.0
+
+    def stats(self):
+        """Returns statistics about the cache's performance.
+
+        Returns:
+            A dict with the keys 'hits', 'misses', 'stale', 'evictions', and
+            'compute_time', as described in the class attributes, and 'size'
+            and 'nbytes', the current number of entries and their estimated
+            size in bytes.
+        """
+        with self._locked():
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'compute_time': self.compute_time,
+                'size': len(self.cache),
+                'nbytes': self.nbytes,
+            }
 
     def update_mod_times(self):
-        """Updates self.mod_times."""
-        d = self.cache
-        self.mod_times = sorted(d, key=lambda k: d[k][0])
+        """Does nothing, since self.mod_times is always up to date.
+
+        Kept for compatibility.
+        """
+        pass
 
 
 class ModifiedCache(Cache):
     """A cache that can check if values need to be updated.
 
     Attributes:
-        cache: The cache as a dict, whose keys are the arguments to the
+        cache: The cache as an OrderedDict, whose keys are the arguments to the
             function the cache computes, and whose values are tuples of the
-            last modified time, and the result of the funciton.
+            result of modified the value was computed with, the result of the
+            funciton, and the last time it was checked with modified. It is
+            ordered from least to most recently used.
         funct: The function whose results the cache stores.
         max_size: An int. If the cache has more than max_size entries, the
-            oldest entries are purged. If set to -1, the cache has unlimited
-            size.
-        mod_times: A list of keys, in order of last modification time, oldest
-            first.
+            least recently used entries are purged. If set to -1, the cache has
+            unlimited size.
+        mod_times: A list of keys, in order of last use, least recent first.
         modified: A function that checks whether a cached value needs to be
-            updated, by returning a timestamp to compare with the last modified
-            time of the cached value. Should take the same arguments as funct.
+            updated, by returning a value, such as a modification time, which
+            is compared to the one the cached value was computed with. Should
+            take the same arguments as funct.
+        interval: The number of seconds after checking a cached value with
+            modified before it needs to be checked again.
+        max_bytes: An int. If the estimated size of the cache's keys and
+            values is more than max_bytes, the least recently used entries are
+            purged. If set to -1, the cache has unlimited size.
+        sizeof: The function used to estimate the size of keys and values.
+        nbytes: The estimated size of the cache's keys and values, in bytes.
+        backend: A persistent store, such as an SQLiteBackend, which is
+            checked before computing a value, and which computed values are
+            written to, or None.
+        thread_safe: Whether the cache can be used from several threads at
+            once, as in Cache.
     """
-    def __init__(self, funct, modified, max_size=-1):
+    def __init__(self, funct, modified, max_size=-1, interval=0,
+                 max_bytes=-1, sizeof=estimate_size, backend=None,
+                 thread_safe=False):
         """Initializes a cache.
 
         Args:
             funct: The function whose results the cache stores.
             modified: The function to check whether a cached value needs to be
                 updated. Should take the same arguments as funct, and return
-                something that can be compared to a timestamp returned by
-                time.time().
+                something which changes whenever the value needs to be
+                updated, such as a modification time.
             max_size: (Optional) The maximum number of entries in the cache. If
                 set to -1 (default), the cache has no limit.
+            interval: (Optional) The number of seconds after checking a cached
+                value before it needs to be checked again. If set to 0
+                (default), it is checked every time.
+            max_bytes: (Optional) The maximum estimated size of the cache, in
+                bytes. If set to -1 (default), the cache has no limit.
+            sizeof: (Optional) The function used to estimate the size of keys
+                and values. Defaults to estimate_size.
+            backend: (Optional) A persistent store shared with other caches,
+                such as an SQLiteBackend. Values in it are used if they were
+                computed with the current result of modified. Defaults to
+                None.
+            thread_safe: (Optional) Whether the cache can be used from several
+                threads at once. Defaults to False.
         """
-        super().__init__(funct, max_size)
+        super().__init__(funct, max_size, max_bytes, sizeof, thread_safe)
         self.modified = modified
+        self.interval = interval
+        self.backend = backend
 
-    def __call__(self, *args):
-        """Calls the function or returns a cached value.
+    def lookup(self, args):
+        """Looks up a value in the cache, without computing it.
 
-        If *args exists as a key of self.cache, and has not been modified, the
-        cached value is returned. Otherwise, self.funct is called, and the
-        result is cached.
+        If the cached value was checked less than self.interval seconds ago,
+        it isn't checked again.
 
         Args:
-            *args: The arguments to be passed to self.funct or to be looked up
-                in self.cache.
+            args: The tuple of arguments to look up.
 
         Returns:
-            The result of the function or a cached value.
+            A tuple of whether an up to date value was found, and the value
+            (or None if it wasn't).
+        """
+        entry = self.cache.get(args)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        now = time.time()
+        if now - entry[2] >= self.interval:
+            if self.modified(*args) != entry[0]:
+                # it needs to be updated
+                self.stale += 1
+                return False, None
+            self.cache[args] = entry[0], entry[1], now
+        # it's now the most recently used entry
+        self.cache.move_to_end(args)
+        self.hits += 1
+        return True, entry[1]
+
+    def compute(self, *args):
+        """Calls the function, or gets an up to date result from the backend.
+
+        Args:
+            *args: The arguments to self.funct.
+
+        Returns:
+            A tuple of the result of self.modified the result was computed
+            with, and the result.
         """
-        if (args not in self.cache or
-            self.modified(*args) > self.cache[args][0]):
-            # it needs to be updated
-            self.update(*args)
-        # retrieve cached value
-        return self.cache[args][1]
+        # taken before calling the function, so that changes made while it
+        # runs are noticed next time. The snapshot of modification times can
+        # be out of date, so the time the function was called can't be used
+        # instead: a file changed just before it would never be noticed
+        version = self.modified(*args)
+        if self.backend is not None:
+            stored = self.backend.get(args)
+            if stored is not None and stored[0] == version:
+                return stored
+        _, value = super().compute(*args)
+        if self.backend is not None:
+            self.backend.set(args, version, value)
+        return version, value
+
+    def store(self, args, version, value):
+        """Adds a computed value to the cache, as in Cache.store.
+
+        Args:
+            args: The tuple of arguments the value was computed from.
+            version: The result of self.modified the value was computed with.
+            value: The value.
+        """
+        super().store(args, version, value)
+        if args in self.cache:
+            # it was just checked
+            self.cache[args] = version, value, time.time()
+
+
+class SQLiteBackend(object):
+    """A persistent store for cache entries, in an SQLite database.
+
+    Several processes can share the same database file, so that values
+    computed by one are available to all of them. Keys are stored as their
+    repr, and values are pickled.
+
+    Attributes:
+        filename: The path to the database file.
+        table: The name of the table the entries are stored in.
+    """
+    def __init__(self, filename, table='cache'):
+        """Initializes the backend, creating the table if necessary.
+
+        Args:
+            filename: The path to the database file.
+            table: (Optional) The name of the table to store entries in, so
+                that several caches can share a file. Defaults to 'cache'.
+        """
+        self.filename = os.path.expanduser(filename)
+        self.table = table
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS "{}" (key TEXT PRIMARY '
+                         'KEY, time REAL, value BLOB)'.format(self.table))
+
+    def connection(self):
+        """Returns a connection to the database for this thread and process.
+
+        Connections can't be shared between threads, or used after a fork.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.filename, timeout=30)
+            local.conn.execute('PRAGMA journal_mode=WAL')
+            local.pid = os.getpid()
+        return local.conn
+
+    def get(self, key):
+        """Gets an entry.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            A tuple of the time stored with the value and the value, or None if
+            the key isn't stored.
+        """
+        row = self.connection().execute(
+            'SELECT time, value FROM "{}" WHERE key = ?'.format(self.table),
+            (repr(key),)).fetchone()
+        if row is None:
+            return None
+        return row[0], pickle.loads(row[1])
+
+    def set(self, key, t, value):
+        """Stores an entry, replacing any existing entry with the same key.
+
+        Args:
+            key: The key of the entry.
+            t: The time to store with the value, such as the modification time
+                it was computed with.
+            value: The value.
+        """
+        with self.connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO "{}" VALUES (?, ?, ?)'.format(
+                    self.table),
+                (repr(key), t,
+                 pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+
+    def clear(self):
+        """Removes every entry."""
+        with self.connection() as conn:
+            conn.execute('DELETE FROM "{}"'.format(self.table))
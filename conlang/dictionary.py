@@ -1,10 +1,28 @@
 import collections
+import collections.abc
+import concurrent.futures
 import itertools
 import os
 import json
+import operator
 import regex
+import sys
+import time
 from soundchanger.conlang import cache, entry_format, sound_changer
 
+# The default number of worker processes used by apply_rule_list and
+# apply_rule_files. If set to 1, the rules are applied in this process.
+WORKERS = 1
+
+# The number of lines of a text file parsed at a time by each worker process
+# in from_text.
+PARSE_CHUNK_SIZE = 10000
+
+# The number of Entries a Dictionary needs before search builds an index of
+# the field searched. Smaller Dictionaries are searched by checking every
+# Entry.
+INDEX_MIN_SIZE = 1000
+
 
 def custom_encode(obj):
     """Custom JSON encoder for Dictionary and Entry classes.
@@ -15,7 +33,7 @@ def custom_encode(obj):
     Returns:
         For a Dictionary, a dict with one entry, whose key is '__Dictionary__',
         and whose value is [list(obj), obj.alpha, obj.pat, obj.pat_args,
-        obj.auto_fields]. For an Entry, obj.data.
+        obj.auto_fields]. For an Entry or Row, obj.data.
 
     Raises:
         TypeError: obj not of type Dictionary or Entry.
@@ -24,17 +42,19 @@ def custom_encode(obj):
         key = '__Dictionary__'
         return {key: [list(obj), obj.alpha, obj.pat, obj.pat_args,
                       obj.auto_fields]}
-    elif isinstance(obj, Entry):
+    elif isinstance(obj, EntryMethods):
         return obj.data
     else:
         raise TypeError("obj {!r} of type {}".format(obj, type(obj)))
 
 
-def class_hook(dct):
+def class_hook(dct, cls=None):
     """JSON object hook to decode classes.
 
     Args:
         dct: The dict generated from the JSON
+        cls: (Optional) The class to decode a Dictionary as. Defaults to
+            Dictionary.
 
     Returns:
         If dct has one entry, whose key is '__Dictionary__' the Dictionary
@@ -43,35 +63,152 @@ def class_hook(dct):
         class_name, value = next(iter(dct.items()))
         class_name = class_name.strip('_')
         if class_name == 'Dictionary':
-            return Dictionary(*value)
+            return (cls or Dictionary)(*value)
     return dct
 
 
+def parse_lines(lines, pat=None, pat_args=None, start=1):
+    """Parses lines of text into the fields of Entries.
+
+    Args:
+        lines: An iterable of lines of text, each holding one Entry.
+        pat: (Optional) The pattern to parse the lines with, using the format
+            specified in the entry_format module.
+        pat_args: (Optional) The pattern arguments to parse the lines with,
+            using the format specified in the entry_format module.
+        start: (Optional) The line number of the first line. Defaults to 1.
+
+    Returns:
+        A tuple of a list of dicts of the non-empty fields of each Entry, and
+        a list of tuples of the line number and text of each line which
+        didn't match the pattern. Blank lines are skipped.
+    """
+    matcher = entry_format.match(pat, pat_args)
+    entries = []
+    unparsed = []
+    for n, line in enumerate(lines, start):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        m = matcher.match(line)
+        data = {} if m is None else {k: v for k, v in m.groupdict().items()
+                                     if v}
+        if data:
+            entries.append(data)
+        else:
+            unparsed.append((n, line))
+    return entries, unparsed
+
+
+def _parse_chunk(args):
+    """Parses a chunk of lines for from_text in a worker process."""
+    return parse_lines(*args)
+
+
+def run_rules(words, rules, workers=None):
+    """Applies a sequence of compiled rule lists to a list of words.
+
+    Args:
+        words: The list of words.
+        rules: A list of sound_changer.CompiledRuleLists, to be applied in
+            order.
+        workers: (Optional) The number of worker processes to split the words
+            between. Defaults to WORKERS.
+
+    Returns:
+        A list of the results, in the same order as words.
+    """
+    if workers is None:
+        workers = WORKERS
+    if workers > 1 and len(words) > 1:
+        return sound_changer.apply_parallel(words, rules, workers)
+    out = []
+    for word in words:
+        for r in rules:
+            word = r.apply(word)
+        out.append(word)
+    return out
+
+
+def open_new(filename, override=False):
+    """Opens a file for writing, checking before overwriting it.
+
+    Args:
+        filename: The path to the file to open.
+        override: If set to True, the file will be opened, even if it exists.
+            Otherwise, if the file exists, the user will be prompted to
+            overwrite it. Defaults to False.
+
+    Returns:
+        The file, opened for writing, or None if the user chose not to
+        overwrite it.
+    """
+    try:
+        return open(os.path.expanduser(filename), 'x', encoding='utf-8')
+    except FileExistsError:
+        if not override:
+            print('File exists, overwrite? [Y/n]', end=' ')
+            if 'n' in input().lower():
+                return None
+        return open(os.path.expanduser(filename), 'w', encoding='utf-8')
+
+
+def intern(value):
+    """Interns a value if it is a str, so equal values share memory."""
+    return sys.intern(value) if type(value) is str else value
+
+
+def entry_data(e, pat=None, pat_args=None):
+    """Converts a dict or str to the fields of an Entry.
+
+    Args:
+        e: A dict or str. If a str, it is parsed using pat and pat_args.
+        pat: (Optional) The pattern to parse e with, using the format
+            specified in the entry_format module.
+        pat_args: (Optional) The pattern arguments to parse e with, using the
+            format specified in the entry_format module.
+
+    Returns:
+        A dict of the non-empty fields of e. If e is a str which doesn't match
+        the pattern, the dict is empty.
+    """
+    if isinstance(e, str):
+        m = entry_format.match(pat, pat_args).match(e)
+        if m is None:
+            return {}
+        e = m.groupdict()
+    return {k: v for k, v in e.items() if v}
+
+
 class DictionaryMethods(object):
     """Methods for a Dictionary.
 
     """
 
-    def apply_rule_list(self, lines, field1='pron', field2=None):
+    def apply_rule_list(self, lines, field1='pron', field2=None,
+                        workers=None):
         """Applies a list of sound change rules.
 
         Applies a list of sound change rules to each Entry in the Dictionary.
 
         Args:
-            lines: The list of rules to apply.
+            lines: The list of rules to apply, or a
+                sound_changer.CompiledRuleList.
             field1: The field of each Entry to apply the rules to. Defaults to
                 'pron'.
             field2: The field of each Entry to assign the result of the sound
                 change to. Defaults to whatever field1 is.
+            workers: (Optional) The number of worker processes to split the
+                Entries between. Defaults to WORKERS.
         """
         if field2 is None:
             field2 = field1
-        for e in self:
-            # sound_changer.apply_rule_list returns a tuple of the word and
-            # the debug lines, but we only want the word
-            e[field2] = sound_changer.apply_rule_list(e[field1], lines)
+        # compile the rules once, rather than once per Entry
+        lines = sound_changer.compile_rule_list(lines)
+        self._apply_rules([lines], field1, field2, workers)
 
-    def apply_rule_files(self, pairs, field1='pron', field2=None):
+    def apply_rule_files(self, pairs, field1='pron', field2=None,
+                         workers=None):
         """Applies a set of sound change files.
 
         Applies the set of sound change files specified by pairs (as in
@@ -86,11 +223,65 @@ class DictionaryMethods(object):
                 'pron'.
             field2: The field of each Entry to assign the result of the sound
                 change to. Defaults to whatever field1 is.
+            workers: (Optional) The number of worker processes to split the
+                Entries between. Defaults to WORKERS.
         """
         if field2 is None:
             field2 = field1
-        for e in self:
-            e[field2] = self.cache(e[field1], pairs)[0]
+        # each file is loaded and compiled once, rather than once per Entry
+        stages = sound_changer.load_stages(pairs, self.cache.file_cache)
+        self._apply_rules([rules for cur, rules in stages], field1, field2,
+                          workers)
+
+    def _apply_rules(self, rules, field1, field2, workers=None):
+        """Applies a sequence of compiled rule lists to each Entry.
+
+        Args:
+            rules: A list of sound_changer.CompiledRuleLists, to be applied in
+                order.
+            field1: The field of each Entry to apply the rules to.
+            field2: The field of each Entry to assign the result to.
+            workers: (Optional) The number of worker processes to split the
+                Entries between. Defaults to WORKERS.
+        """
+        self._set_column(field2,
+                         run_rules(self._column(field1), rules, workers))
+
+    def _column(self, field):
+        """Returns a list of the values of a field, one per Entry.
+
+        Raises:
+            KeyError: An Entry doesn't have the field.
+        """
+        return [e[field] for e in self]
+
+    def _set_column(self, field, values):
+        """Sets a field of each Entry, given a list of values, one per Entry.
+        """
+        for e, value in zip(self, values):
+            e[field] = value
+
+    def _subview(self, indices):
+        """Returns a view of some of the Entries.
+
+        Args:
+            indices: An iterable of indices of the Entries.
+        """
+        return DictionaryView(self, indices)
+
+    def _values(self, field, indices=None):
+        """Returns a list of the values of a field, one per Entry.
+
+        Entries without the field have a value of None.
+
+        Args:
+            field: The field.
+            indices: (Optional) An iterable of the indices of the Entries to
+                get the values of. Defaults to every Entry.
+        """
+        if indices is None:
+            return [e.get(field) for e in self]
+        return [self[i].get(field) for i in indices]
 
     def format_string(self, pat=None, pat_args=None):
         """Formats the Dictionary using a specified pattern.
@@ -111,21 +302,66 @@ class DictionaryMethods(object):
                 pat_args = self.pat_args
         return '\n'.join(e.format_string(pat, pat_args) for e in self)
 
-    def search(self, s, field='word', cats=None):
+    def search(self, s, field='word', cats=None, spans=False):
         """Searches the Dicitonary.
 
+        The search is parsed and compiled once, and then run over the values
+        of the field. Entries without the field don't match.
+
         Args:
             s: The string to search for. If cats is specified, can use sound
-                change rule syntax.
-            field: The field to search for the string in. Defaults to 'word'.
+                change rule syntax. Can also be a Search.
+            field: The field to search for the string in, or a list of fields,
+                in which case an Entry matches if any of them match. Defaults
+                to 'word'.
             cats: (Optional) The categories to use if searching using sound
                 change rule syntax.
+            spans: (Optional) If set to True, the spans of the matches are
+                stored in the spans attribute of the DictionaryView, for
+                highlighting. Defaults to False.
 
         Returns:
             A DictionaryView containing all the Entries that match the string.
+            If spans is True, its spans attribute is a list with a dict for
+            each Entry, whose keys are the fields that matched, and whose
+            values are lists of the spans of the matches in that field.
         """
-        indices = (i for i, v in enumerate(self) if v.check(s, field, cats))
-        return DictionaryView(self, indices)
+        query = s if isinstance(s, Search) else Search(s, cats)
+        fields = [field] if isinstance(field, str) else list(field)
+        # narrow down the Entries to check, if possible
+        indices = set()
+        for f in fields:
+            candidates = self._candidates(query.requirements, f)
+            if candidates is None:
+                indices = None
+                break
+            indices.update(candidates)
+        else:
+            indices = sorted(indices)
+        # only the values of the Entries being checked are fetched
+        columns = [(f, self._values(f, indices)) for f in fields]
+        if indices is None:
+            indices = range(len(self))
+        selection = []
+        found = []
+        for n, i in enumerate(indices):
+            if spans:
+                matched = {}
+                for f, values in columns:
+                    if values[n] is not None:
+                        matches = query.spans(values[n])
+                        if matches:
+                            matched[f] = matches
+                if matched:
+                    selection.append(i)
+                    found.append(matched)
+            elif any(values[n] is not None and query.check(values[n])
+                     for f, values in columns):
+                selection.append(i)
+        view = self._subview(selection)
+        if spans:
+            view.spans = found
+        return view
 
     def sorted(self, field='word', order=None):
         """Returns a sorted view of the Dictionary.
@@ -149,9 +385,12 @@ class DictionaryMethods(object):
         if order is None:
             indices = sorted(range(len(self)), key=lambda x: self[x][field])
         else:
+            if not callable(order):
+                # build the collator once, rather than once per Entry
+                order = sort_key(order)
             indices = sorted(range(len(self)),
                              key=lambda x: self[x].order_key(field, order))
-        return DictionaryView(self, indices)
+        return self._subview(indices)
 
     def to_JSON(self, filename, override=False):
         """Saves the dictionary to the specified file.
@@ -162,17 +401,35 @@ class DictionaryMethods(object):
                 exists. Otherwise, if the file exists, the user will be
                 prompted to overwrite it. Defaults to False.
         """
-        try:
-            f = open(os.path.expanduser(filename), 'x', encoding='utf-8')
-        except FileExistsError:
-            if not override:
-                print('File exists, overwrite? [Y/n]', end=' ')
-                if 'n' in input().lower():
-                    return
-            f = open(os.path.expanduser(filename), 'w', encoding='utf-8')
-        finally:
+        f = open_new(filename, override)
+        if f is None:
+            return
+        with f:
             json.dump(self, f, default=custom_encode)
-            f.close()
+
+    def to_JSONL(self, filename, override=False):
+        """Saves the dictionary to the specified file as JSON Lines.
+
+        The first line is a header holding alpha, pat, pat_args, and
+        auto_fields, and each line after it holds one Entry. The Entries are
+        written one at a time, so the whole Dictionary is never held in memory
+        as JSON. It can be loaded with from_JSONL or read with JSONLReader.
+
+        Args:
+            filename: The path to the file to write to.
+            override: If set to True, the file will be written, even if it
+                exists. Otherwise, if the file exists, the user will be
+                prompted to overwrite it. Defaults to False.
+        """
+        f = open_new(filename, override)
+        if f is None:
+            return
+        header = {'alpha': self.alpha, 'pat': self.pat,
+                  'pat_args': self.pat_args, 'auto_fields': self.auto_fields}
+        with f:
+            f.write(json.dumps({'__Dictionary__': header}) + '\n')
+            for e in self:
+                f.write(json.dumps(e.data) + '\n')
 
     def to_text(self, filename, override=False, pat=None, pat_args=None):
         """Saves the dictionary as text using the specified format.
@@ -191,21 +448,15 @@ class DictionaryMethods(object):
             pat = self.pat
         if pat_args is None:
             pat_args = self.pat_args
-        try:
-            f = open(os.path.expanduser(filename), 'x', encoding='utf-8')
-        except FileExistsError:
-            if not override:
-                print('File exists, overwrite? [Y/n]', end=' ')
-                if 'n' in input().lower():
-                    return
-            f = open(os.path.expanduser(filename), 'w', encoding='utf-8')
-        finally:
+        f = open_new(filename, override)
+        if f is None:
+            return
+        with f:
             f.write(self.format_string(pat, pat_args))
-            f.close()
 
 
-class Dictionary(DictionaryMethods, collections.UserList):
-    """A dictionary containing entries in a conlang.
+class BaseDictionary(DictionaryMethods):
+    """Methods for a Dictionary which stores its own Entries.
 
     Attributes:
         alpha: The default alphabetical ordering to use when sorting on the
@@ -224,15 +475,15 @@ class Dictionary(DictionaryMethods, collections.UserList):
             whose values are tuples of the field from which it is generated,
             and a tuple that can be passed to
             sound_changer.apply_rule_files.
+        unparsed: A list of tuples of the line number and text of each line
+            which couldn't be parsed, when the Dictionary was loaded by
+            from_text.
     """
 
-    def __init__(self, l=None, alpha=None, pat=None, pat_args=None,
-                 auto_fields=None):
-        """Initializes a Dictionary with a list.
+    def __init__(self, alpha=None, pat=None, pat_args=None, auto_fields=None):
+        """Initializes the attributes of a Dictionary.
 
         Args:
-            l: The list of Entries to initialize the Dictionary with. Defaults
-                to an empty list.
             alpha: The alphabetical ordering for the Dictionary.
             pat: The default pattern for printing the Dictionary.
             pat_args: The default pattern arguments for printing the
@@ -243,8 +494,6 @@ class Dictionary(DictionaryMethods, collections.UserList):
                 it is generated, and a tuple that can be passed to
                 sound_changer.apply_rule_files.
         """
-        if l is None:
-            l = []
         self.alpha = alpha
         self.pat = pat
         self.pat_args = pat_args
@@ -253,9 +502,12 @@ class Dictionary(DictionaryMethods, collections.UserList):
             pairs = self.auto_fields[f][1]
             self.auto_fields[f][1] = tuple(tuple(p) for p in pairs)
         self.cache = sound_changer.SoundChangeCache()
+        self.unparsed = []
+        self._indexes = {}
+        # the positions of Entries, by id, for DictionaryView membership
+        self._positions = None
+        self._auto_checked = {}
         super().__init__()
-        for e in l:
-            self.append(e)
 
     @classmethod
     def from_JSON(cls, filename):
@@ -268,13 +520,35 @@ class Dictionary(DictionaryMethods, collections.UserList):
             A Dictionary.
         """
         with open(os.path.expanduser(filename), encoding='utf-8') as f:
-            return json.load(f, object_hook=class_hook)
+            return json.load(f, object_hook=lambda d: class_hook(d, cls))
+
+    @classmethod
+    def from_JSONL(cls, filename):
+        """Loads a Dictionary from a JSON Lines file written by to_JSONL.
+
+        The Entries are added as they are read, so the file is never held in
+        memory as a whole.
+
+        Args:
+            filename: The path to the file to load from.
+
+        Returns:
+            A Dictionary.
+        """
+        with JSONLReader(filename) as reader:
+            d = cls(None, reader.alpha, reader.pat, reader.pat_args,
+                    reader.auto_fields)
+            d.extend(reader)
+        return d
 
     @classmethod
     def from_text(cls, filename, alpha=None, pat=None, pat_args=None,
-                  auto_fields=None):
+                  auto_fields=None, workers=None, strict=False):
         """Loads a Dictionary from a text file.
 
+        Lines which don't match the pattern are listed in the unparsed
+        attribute of the Dictionary.
+
         Args:
             filename: The path to the file to load from.
             alpha: (Optional) The alphabetical ordering for the Dictionary.
@@ -285,33 +559,285 @@ class Dictionary(DictionaryMethods, collections.UserList):
                 file.  Defaults to the default behavior of entry_format.match.
             auto_fields: (Optional) Fields to be automatically generated for
                 each Entry. Defaults to {}
+            workers: (Optional) The number of worker processes to split the
+                parsing between, in chunks of PARSE_CHUNK_SIZE lines. Defaults
+                to WORKERS.
+            strict: (Optional) If set to True, a line which doesn't match the
+                pattern is an error. Defaults to False.
+
+        Returns:
+            A Dictionary.
+
+        Raises:
+            ValueError: strict is True, and a line doesn't match the pattern.
         """
+        if workers is None:
+            workers = WORKERS
+        d = cls(None, alpha, pat, pat_args, auto_fields)
         with open(os.path.expanduser(filename), encoding='utf-8') as f:
-            return cls(f, alpha, pat, pat_args)
+            if workers > 1:
+                lines = f.readlines()
+                chunks = [(lines[i:i + PARSE_CHUNK_SIZE], pat, pat_args, i + 1)
+                          for i in range(0, len(lines), PARSE_CHUNK_SIZE)]
+                with concurrent.futures.ProcessPoolExecutor(workers) as ex:
+                    results = list(ex.map(_parse_chunk, chunks))
+            else:
+                results = [parse_lines(f, pat, pat_args)]
+        for entries, unparsed in results:
+            if strict and unparsed:
+                n, line = unparsed[0]
+                raise ValueError('{}, line {}: {!r} doesn\'t match the '
+                                 'pattern'.format(filename, n, line))
+            d.unparsed.extend(unparsed)
+            d.extend(entries)
+        return d
+
+    def __str__(self):
+        return self.format_string()
+
+    def _candidates(self, requirements, field):
+        """Finds the Entries which could meet a set of requirements.
+
+        Args:
+            requirements: A list of tuples of strings, as returned by
+                search_requirements.
+            field: The field the requirements apply to.
+
+        Returns:
+            A sorted list of the indices of the Entries whose field could meet
+            the requirements, or None if the index can't narrow them down.
+        """
+        if (not requirements or len(self) < INDEX_MIN_SIZE or
+                field in self.auto_fields):
+            return None
+        candidates = self.ngram_index(field).candidates(requirements)
+        return None if candidates is None else sorted(candidates)
+
+    def _auto_version(self, field):
+        """Returns the version of the rules generating an auto field.
+
+        The modification times of the rule files are checked at most once
+        every cache.mtimes.interval seconds.
+
+        Args:
+            field: The automatically generated field.
+
+        Returns:
+            A tuple of the pairs of sound change files which generate the
+            field, and the latest modification time of those files. A value
+            generated with a different version is out of date.
+
+        Raises:
+            KeyError: field isn't an automatically generated field.
+        """
+        pairs = self.auto_fields[field][1]
+        now = time.time()
+        checked = self._auto_checked.get(field)
+        if (checked is not None and checked[1] == pairs and
+                now - checked[0] < cache.mtimes.interval):
+            return checked[2]
+        version = pairs, sound_changer.modified(pairs)
+        self._auto_checked[field] = now, pairs, version
+        return version
+
+    def _field_changed(self, field):
+        """Drops the index of a field, after an Entry's field has changed."""
+        self._indexes.pop(field, None)
+
+    def _position(self, item):
+        """Finds the position of an Entry in the Dictionary.
+
+        Args:
+            item: The Entry.
+
+        Returns:
+            The index of item, if it is one of the Dictionary's Entries, or
+            None otherwise.
+        """
+        return None
+
+    def clear_indexes(self):
+        """Drops the indexes used by search and DictionaryViews.
+
+        They are rebuilt when they are next needed.
+        """
+        self._indexes.clear()
+        self._positions = None
+
+    def refresh_auto_fields(self, fields=None, workers=None):
+        """Generates the automatically generated fields of every Entry.
+
+        Generated values are stored in each Entry, and are only generated
+        again when the field they are generated from changes, or when one of
+        the sound change files changes. This generates them all at once,
+        applying the sound changes once to each distinct value, rather than
+        one at a time as they are read.
+
+        Args:
+            fields: (Optional) The list of fields to generate. Defaults to
+                every field in auto_fields.
+            workers: (Optional) The number of worker processes to split the
+                values between. Defaults to WORKERS.
+        """
+        if fields is None:
+            fields = list(self.auto_fields)
+        for field in fields:
+            src, pairs = self.auto_fields[field]
+            version = self._auto_version(field)
+            entries = [e for e in self if src in e]
+            sources = [e[src] for e in entries]
+            words = list(dict.fromkeys(sources))
+            stages = sound_changer.load_stages(pairs, self.cache.file_cache)
+            results = run_rules(words, [rules for cur, rules in stages],
+                                workers)
+            results = dict(zip(words, results))
+            for e, source in zip(entries, sources):
+                e._store_auto(field, source, version, results[source])
+
+    def ngram_index(self, field='word'):
+        """Returns the index of a field used by search.
+
+        The index is built the first time it is needed, and kept up to date as
+        Entries are appended or replaced.
+
+        Args:
+            field: The field to index. Defaults to 'word'.
+
+        Returns:
+            An NGramIndex of the field.
+        """
+        try:
+            return self._indexes[field]
+        except KeyError:
+            ind = self._indexes[field] = NGramIndex(field, self)
+            return ind
+
+
+class Dictionary(BaseDictionary, collections.UserList):
+    """A dictionary containing entries in a conlang.
+
+    Each Entry is stored as its own object. The attributes are described in
+    BaseDictionary.
+    """
+
+    def __init__(self, l=None, alpha=None, pat=None, pat_args=None,
+                 auto_fields=None):
+        """Initializes a Dictionary with a list.
+
+        Args:
+            l: The list of Entries to initialize the Dictionary with. Defaults
+                to an empty list.
+            alpha: The alphabetical ordering for the Dictionary.
+            pat: The default pattern for printing the Dictionary.
+            pat_args: The default pattern arguments for printing the
+                Dictionary.
+            auto_fields: Fields to be automatically generated for each Entry.
+                Should be a dict whose keys are the fields to be automatically
+                generated, and whose values are tuples of the field from which
+                it is generated, and a tuple that can be passed to
+                sound_changer.apply_rule_files.
+        """
+        if l is None:
+            l = []
+        super().__init__(alpha, pat, pat_args, auto_fields)
+        for e in l:
+            self.append(e)
 
     def __add__(self, d):
         return type(self)(super().__add__(d), self.alpha, self.pat,
                 self.pat_args, self.auto_fields)
 
+    def __delitem__(self, i):
+        self.clear_indexes()
+        super().__delitem__(i)
+
     def __getitem__(self, i):
         if isinstance(i, slice):
             return DictionaryView(self, i)
         return super().__getitem__(i)
 
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        self.clear_indexes()
+        return super().__imul__(n)
+
     def __mul__(self, n):
         return type(self)(super().__mul__(n), self.alpha, self.pat,
                 self.pat_args)
 
     def __setitem__(self, index, data):
+        if isinstance(index, slice):
+            self.clear_indexes()
+            super().__setitem__(index, data)
+            return
+        index = range(len(self))[index]
+        for ind in self._indexes.values():
+            ind.remove(index, self.data[index])
+            ind.add(index, data)
+        if self._positions is not None:
+            old = id(self.data[index])
+            if self._positions.get(old) == index:
+                del self._positions[old]
+            # an Entry in more than one place doesn't have a single position
+            self._positions[id(data)] = (
+                None if id(data) in self._positions else index)
         super().__setitem__(index, data)
 
-    def __str__(self):
-        return self.format_string()
+    def _position(self, item):
+        """Finds the position of an Entry in the Dictionary.
+
+        Args:
+            item: The Entry.
+
+        Returns:
+            The index of item, if it is one of the Dictionary's Entries, or
+            None otherwise, or if it is in more than one place.
+        """
+        if self._positions is None:
+            self._positions = {}
+            for i, e in enumerate(self.data):
+                self._positions[id(e)] = (
+                    None if id(e) in self._positions else i)
+        i = self._positions.get(id(item))
+        if i is not None and self.data[i] is item:
+            return i
+        return None
 
     def append(self, entry):
         e = Entry(entry, self)
         if e:
-            super().append(Entry(entry, self))
+            for ind in self._indexes.values():
+                ind.add(len(self), e)
+            if self._positions is not None:
+                self._positions[id(e)] = len(self)
+            super().append(e)
+
+    def clear(self):
+        self.clear_indexes()
+        super().clear()
+
+    def extend(self, other):
+        for e in other:
+            self.append(e)
+
+    def insert(self, i, entry):
+        self.clear_indexes()
+        super().insert(i, entry)
+
+    def pop(self, i=-1):
+        self.clear_indexes()
+        return super().pop(i)
+
+    def remove(self, entry):
+        self.clear_indexes()
+        super().remove(entry)
+
+    def reverse(self):
+        self.clear_indexes()
+        super().reverse()
 
     def sort(self, field='word', order=None):
         """Sorts the Dictionary in place.
@@ -327,12 +853,302 @@ class Dictionary(DictionaryMethods, collections.UserList):
                 value of None. Defaults to standard string ordering.
         """
         self.data = list(self.sorted(field, order))
+        self.clear_indexes()
+
+
+class ColumnarDictionary(BaseDictionary, collections.abc.MutableSequence):
+    """A dictionary which stores each field as a column.
+
+    Rather than storing an Entry object per entry, each field is stored as a
+    list with one value per entry, or None for entries without the field.
+    Values are interned, so a value shared by many entries (such as a part of
+    speech) is only stored once. Indexing or iterating over the Dictionary
+    produces Rows, which read and write the columns.
+
+    The attributes are described in BaseDictionary, as well as:
+        columns: A dict whose keys are fields, and whose values are the lists
+            of the values of the fields.
+        sort_keys: A dict of the sort keys computed by sorted, whose keys are
+            tuples of the field and the Collator, and whose values are tuples
+            of the list of values the keys were computed from, and the list of
+            keys.
+        auto_columns: A dict of the generated values of automatically
+            generated fields, whose keys are the fields, and whose values are
+            tuples of the version of the rules that generated them (as
+            returned by _auto_version), the list of values they were
+            generated from, and the list of generated values. Values which
+            haven't been generated yet are None.
+    """
 
+    def __init__(self, l=None, alpha=None, pat=None, pat_args=None,
+                 auto_fields=None):
+        """Initializes a Dictionary with a list.
 
-class DictionaryView(DictionaryMethods, collections.MappingView,
-                     collections.Set):
+        Args:
+            l: The list of Entries to initialize the Dictionary with. Defaults
+                to an empty list.
+            alpha: The alphabetical ordering for the Dictionary.
+            pat: The default pattern for printing the Dictionary.
+            pat_args: The default pattern arguments for printing the
+                Dictionary.
+            auto_fields: Fields to be automatically generated for each Entry.
+                Should be a dict whose keys are the fields to be automatically
+                generated, and whose values are tuples of the field from which
+                it is generated, and a tuple that can be passed to
+                sound_changer.apply_rule_files.
+        """
+        super().__init__(alpha, pat, pat_args, auto_fields)
+        self.columns = {}
+        self.sort_keys = {}
+        self.auto_columns = {}
+        self._len = 0
+        if l is not None:
+            self.extend(l)
+
+    def __delitem__(self, i):
+        self.clear_indexes()
+        self.auto_columns.clear()
+        for column in self.columns.values():
+            del column[i]
+        if self.columns:
+            self._len = len(next(iter(self.columns.values())))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return DictionaryView(self, i)
+        return Row(self, range(self._len)[i])
+
+    def __iter__(self):
+        return (Row(self, i) for i in range(self._len))
+
+    def __len__(self):
+        return self._len
+
+    def __setitem__(self, i, entry):
+        if isinstance(i, slice):
+            raise TypeError('ColumnarDictionary only assigns single entries')
+        i = range(self._len)[i]
+        data = self._row_data(entry)
+        old = Row(self, i).data
+        for field, column in self.columns.items():
+            column[i] = data.pop(field, None)
+        for field, value in data.items():
+            self._new_column(field)[i] = value
+        for ind in self._indexes.values():
+            ind.remove(i, old)
+            ind.add(i, Row(self, i))
+
+    def _column(self, field):
+        """Returns a list of the values of a field, one per Entry.
+
+        For a stored field, this is the column itself, which shouldn't be
+        modified.
+
+        Raises:
+            KeyError: An Entry doesn't have the field.
+        """
+        if field not in self.columns and field in self.auto_fields:
+            return [row[field] for row in self]
+        column = self.columns[field]
+        if None in column:
+            raise KeyError(field)
+        return column
+
+    def _values(self, field, indices=None):
+        """Returns a list of the values of a field, one per Entry.
+
+        Entries without the field have a value of None. For a stored field,
+        with indices unspecified, this is the column itself, which shouldn't
+        be modified.
+
+        Args:
+            field: The field.
+            indices: (Optional) An iterable of the indices of the Entries to
+                get the values of. Defaults to every Entry.
+        """
+        if field not in self.columns:
+            return super()._values(field, indices)
+        column = self.columns[field]
+        if indices is None:
+            return column
+        return [column[i] for i in indices]
+
+    def _position(self, item):
+        """Finds the position of an Entry in the Dictionary.
+
+        Args:
+            item: The Row.
+
+        Returns:
+            The index of item, if it is a Row of the Dictionary, or None
+            otherwise.
+        """
+        if (isinstance(item, Row) and item.parent is self and
+                item.index < self._len):
+            return item.index
+        return None
+
+    def _new_column(self, field):
+        """Adds an empty column for a field, and returns it."""
+        column = self.columns[field] = [None] * self._len
+        return column
+
+    def _row_data(self, entry):
+        """Converts an entry to a dict of interned values.
+
+        Args:
+            entry: A dict, str, or Entry, as passed to Entry.
+
+        Returns:
+            A dict of the non-empty stored fields of entry.
+        """
+        if isinstance(entry, EntryMethods):
+            entry = entry.data
+        return {sys.intern(k): intern(v) for k, v in
+                entry_data(entry, self.pat, self.pat_args).items()}
+
+    def _set_column(self, field, values):
+        """Sets a field of each Entry, given a list of values, one per Entry.
+        """
+        self.columns[field] = [intern(v) for v in values]
+        self._field_changed(field)
+
+    def append(self, entry):
+        data = self._row_data(entry)
+        if not data:
+            return
+        for field, column in self.columns.items():
+            column.append(data.pop(field, None))
+        for field, value in data.items():
+            self._new_column(field).append(value)
+        self._len += 1
+        for version, sources, values in self.auto_columns.values():
+            sources.append(None)
+            values.append(None)
+        for ind in self._indexes.values():
+            ind.add(self._len - 1, Row(self, self._len - 1))
+
+    def clear(self):
+        self.clear_indexes()
+        self.columns.clear()
+        self.sort_keys.clear()
+        self.auto_columns.clear()
+        self._len = 0
+
+    def insert(self, i, entry):
+        data = self._row_data(entry)
+        if not data:
+            return
+        self.clear_indexes()
+        self.auto_columns.clear()
+        for field, column in self.columns.items():
+            column.insert(i, data.pop(field, None))
+        for field, value in data.items():
+            self._new_column(field).insert(i, value)
+        self._len += 1
+
+    def pop(self, i=-1):
+        e = Entry(self[i].data, self)
+        del self[i]
+        return e
+
+    def remove(self, entry):
+        for i, e in enumerate(self):
+            if e == entry:
+                del self[i]
+                return
+        raise ValueError('entry not in ColumnarDictionary')
+
+    def reverse(self):
+        self.clear_indexes()
+        self.auto_columns.clear()
+        for column in self.columns.values():
+            column.reverse()
+
+    def sort(self, field='word', order=None):
+        """Sorts the Dictionary in place.
+
+        Args:
+            field: The field to sort on. Defaults to 'word'
+            order: The order function or dict to sort by, as in
+                Dictionary.sort.
+        """
+        indices = self.sorted(field, order).selection
+        for f, column in self.columns.items():
+            self.columns[f] = [column[i] for i in indices]
+        for k, (values, keys) in self.sort_keys.items():
+            self.sort_keys[k] = ([values[i] for i in indices],
+                                 [keys[i] for i in indices])
+        for f, (version, sources, values) in self.auto_columns.items():
+            self.auto_columns[f] = (version, [sources[i] for i in indices],
+                                    [values[i] for i in indices])
+        self.clear_indexes()
+
+    def sorted(self, field='word', order=None):
+        """Returns a sorted view of the Dictionary.
+
+        Sort keys computed with a Collator are kept, so sorting again only
+        computes keys for values which have changed.
+
+        Args:
+            field: The field to sort on. Defaults to 'word'
+            order: The order function or dict to sort by, as in
+                Dictionary.sorted.
+
+        Returns:
+            A sorted DictionaryView.
+        """
+        if field == 'word' and order is None:
+            order = self.alpha
+        values = self._column(field)
+        if order is None:
+            keys = values
+        else:
+            if not callable(order):
+                order = sort_key(order)
+            if isinstance(order, Collator):
+                keys = self._collate(field, order, values)
+            else:
+                keys = [order(v) for v in values]
+        return self._subview(sorted(range(self._len), key=keys.__getitem__))
+
+    def _collate(self, field, order, values):
+        """Computes the sort keys of a column, reusing unchanged keys.
+
+        Args:
+            field: The field the values are from.
+            order: The Collator to compute keys with.
+            values: The list of values of the field.
+
+        Returns:
+            The list of keys.
+        """
+        try:
+            old_values, old_keys = self.sort_keys[field, order]
+        except KeyError:
+            old_values = old_keys = ()
+        if len(old_values) != len(values):
+            keys = [order(v) for v in values]
+        else:
+            keys = [k if v is old or v == old else order(v)
+                    for v, old, k in zip(values, old_values, old_keys)]
+        self.sort_keys[field, order] = list(values), keys
+        return keys
+
+
+class DictionaryView(DictionaryMethods, collections.abc.MappingView,
+                     collections.abc.Set):
     """A view of a Dictionary.
 
+    Besides the ordered selection, a view keeps a bitmap of the Entries of the
+    underlying Dictionary it contains, so that membership is a lookup, and
+    set operations between views of the same Dictionary are done on whole
+    bitmaps at once.
+
+    Attributes:
+        selection: The indices in the parent of the Entries in the view.
+        spans: The spans of the matches of each Entry in the view, if it was
+            created by search with spans=True, or None otherwise.
     """
 
     def __init__(self, parent, selection):
@@ -352,6 +1168,9 @@ class DictionaryView(DictionaryMethods, collections.MappingView,
             # 2: subscriptable
             # 3: doesn't run out
             self.selection = list(selection)
+        self.spans = None
+        self._root_selection = None
+        self._bitmap = None
 
     @classmethod
     def _from_iterable(cls, it):
@@ -359,16 +1178,144 @@ class DictionaryView(DictionaryMethods, collections.MappingView,
             it = it.selection
         return set(it)
 
+    def __and__(self, other):
+        out = self._combine(other, operator.and_)
+        return super().__and__(other) if out is NotImplemented else out
+
     def __contains__(self, item):
+        # the Dictionary's own Entries are members if their position is in the
+        # view, even if an equal Entry elsewhere is, as for a set of Entries
+        root, indices = self._root()
+        i = root._position(item)
+        if i is not None:
+            bitmap = self.bitmap
+            return i < len(bitmap) and bool(bitmap[i])
+        # item isn't an Entry of the Dictionary, so compare it to each Entry
         for e in self:
             if e == item:
                 return True
         return False
 
+    def __or__(self, other):
+        out = self._combine(other, operator.or_)
+        return super().__or__(other) if out is NotImplemented else out
+
+    def __sub__(self, other):
+        out = self._combine(other, lambda a, b: a & ~b)
+        return super().__sub__(other) if out is NotImplemented else out
+
+    def __xor__(self, other):
+        out = self._combine(other, operator.xor)
+        return super().__xor__(other) if out is NotImplemented else out
+
+    def _candidates(self, requirements, field):
+        """Finds the Entries which could meet a set of requirements.
+
+        Args:
+            requirements: A list of tuples of strings, as returned by
+                search_requirements.
+            field: The field the requirements apply to.
+
+        Returns:
+            A sorted list of the indices in the view of the Entries whose
+            field could meet the requirements, or None if the Dictionary's
+            index can't narrow them down.
+        """
+        root, indices = self._root()
+        candidates = root._candidates(requirements, field)
+        if candidates is None:
+            return None
+        candidates = set(candidates)
+        return [i for i, j in enumerate(indices) if j in candidates]
+
+    def _combine(self, other, op):
+        """Combines the bitmaps of two views of the same Dictionary.
+
+        Args:
+            other: The other view.
+            op: The function combining the bitmaps, as ints.
+
+        Returns:
+            A view of the Dictionary, of the Entries in the combined bitmap,
+            in the order of the Dictionary, or NotImplemented if other isn't a
+            view of the same Dictionary.
+        """
+        root, indices = self._root()
+        if (not isinstance(other, DictionaryView) or
+                other._root()[0] is not root):
+            return NotImplemented
+        # both bitmaps are the length of the Dictionary as it is now
+        a, b = self.bitmap, other.bitmap
+        n = len(root)
+        mask = op(int.from_bytes(a, 'little'), int.from_bytes(b, 'little'))
+        return type(self)(root, itertools.compress(range(n),
+                                                   mask.to_bytes(n, 'little')))
+
+    def _root(self):
+        """Finds the Dictionary the view is ultimately a view of.
+
+        Returns:
+            A tuple of the Dictionary, and a list of the indices in it of the
+            Entries in the view.
+        """
+        if self._root_selection is None:
+            if isinstance(self._mapping, DictionaryView):
+                root, indices = self._mapping._root()
+                self._root_selection = root, [indices[i]
+                                              for i in self.selection]
+            else:
+                self._root_selection = self._mapping, self.selection
+        return self._root_selection
+
+    def _subview(self, indices):
+        """Returns a view of some of the Entries in the view.
+
+        The new view is a view of the underlying Dictionary, so it doesn't
+        need to go through this view.
+
+        Args:
+            indices: An iterable of indices in this view.
+        """
+        root, selection = self._root()
+        return type(self)(root, [selection[i] for i in indices])
+
+    def _values(self, field, indices=None):
+        """Returns a list of the values of a field, one per Entry.
+
+        Entries without the field have a value of None.
+
+        Args:
+            field: The field.
+            indices: (Optional) An iterable of the indices in the view of the
+                Entries to get the values of. Defaults to every Entry.
+        """
+        root, selection = self._root()
+        if indices is not None:
+            selection = [selection[i] for i in indices]
+        return root._values(field, selection)
+
+    @property
+    def bitmap(self):
+        """A bytearray with a byte for each Entry of the underlying
+        Dictionary, which is 1 if the Entry is in the view, and 0 otherwise.
+
+        It is built again if the length of the Dictionary has changed since it
+        was built, leaving out indices which are no longer in it.
+        """
+        root, indices = self._root()
+        n = len(root)
+        if self._bitmap is None or len(self._bitmap) != n:
+            bitmap = bytearray(n)
+            for i in indices:
+                if i < n:
+                    bitmap[i] = 1
+            self._bitmap = bitmap
+        return self._bitmap
+
     def __getattr__(self, attr):
         # Get these from the parent, but only if they haven't been set manually
         # __getattr__ is only called if attr isn't found normally in the object
-        if attr in ['alpha', 'pat', 'pat_args', 'auto_fields']:
+        if attr in ['alpha', 'pat', 'pat_args', 'auto_fields', 'cache']:
             return self._mapping.__getattribute__(attr)
         # If __getattr__ is being called, attr wasn't found, so if it's not one
         # of the above,
@@ -398,73 +1345,56 @@ class DictionaryView(DictionaryMethods, collections.MappingView,
         return '\n'.join(str(e) for e in self)
 
 
-class Entry(collections.UserDict):
-    """A dictionary entry.
+class EntryMethods(object):
+    """Methods for an Entry.
 
-    Attributes:
-        parent: The Dictionary it is an entry in.
     """
+    # so that Rows don't need a __dict__
+    __slots__ = ()
 
-    def __init__(self, e=None, parent=None):
-        """Initializes an Entry.
+    def __str__(self):
+        return self.format_string()
 
-        Args:
-            e: A dict or str to initialize the Entry with. If a str, it is
-                converted to an Entry using parent.pat and parent.pat_args.
-                Otherwise, it is initialized as if e was passed to dict().
-                Defaults to {}.
-            parent: The Dictionary that contains the Entry. Defaults to a new,
-                empty Dictionary.
-        """
-        self.parent = Dictionary() if parent is None else parent
-        if e is None:
-            e = {}
-        if isinstance(e, str):
-            matcher = entry_format.match(self.parent.pat, self.parent.pat_args)
-            m = matcher.match(e)
-            if m is not None:
-                e = m.groupdict()
-            else:
-                e = {}
-        super().__init__({k: v for k, v in e.items() if v})
+    def _auto_field(self, key):
+        """Returns the value of an automatically generated field.
 
-    def __contains__(self, key):
-        return super().__contains__(key) or key in self.parent.auto_fields
+        The stored value is used, unless the field it is generated from has
+        changed, or the sound change files have, in which case it is generated
+        again and stored.
 
-    def __getitem__(self, key):
-        if key in self.data:
-            return super().__getitem__(key)
+        Raises:
+            KeyError: key isn't an automatically generated field.
+        """
         src, pairs = self.parent.auto_fields[key]
-        return self.parent.cache(self[src], pairs)
-
-    def __iter__(self):
-        yield from self.data.keys() | self.parent.auto_fields.keys()
-
-    def __str__(self):
-        return self.format_string()
+        version = self.parent._auto_version(key)
+        source = self[src]
+        stored = self._stored_auto(key)
+        if (stored is not None and stored[1] == version and
+                stored[0] == source):
+            return stored[2]
+        value = self.parent.cache(source, pairs)
+        self._store_auto(key, source, version, value)
+        return value
+
+    def _collate(self, field, order):
+        """Returns the sort key of a field, given a Collator."""
+        return order(self[field])
 
     def check(self, s, field='word', cats=None):
         """Checks whether the Entry matches a string.
 
         Args:
             s: The string to check for. If cats is specified, can use sound
-                change rule syntax.
+                change rule syntax. Can also be a Search, to avoid compiling
+                it for each Entry.
             field: The field to check for the string in. Defaults to 'word'.
             cats: (Optional) The categories to use if searching using sound
                 change rule syntax.
         """
         f = self[field]
-        if cats is None:
-            # treat s as plain regex
-            return regex.search(s, f) is not None
-        # s is a sound change rule
-        try:
-            # parse s
-            s = sound_changer.parse_rule(s, cats)
-        except AttributeError:
-            # s is a dict (i.e. already parsed)
-            pass
-        return bool(sound_changer.find_matches(f, s, cats)[0])
+        if not isinstance(s, Search):
+            s = Search(s, cats)
+        return s.check(f)
 
     def format_string(self, pat=None, pat_args={}):
         """Formats the Entry using a specified pattern.
@@ -507,18 +1437,477 @@ class Entry(collections.UserDict):
         Returns:
             A key that can be used in sorting.
         """
-        try:
+        if not callable(order):
+            order = sort_key(order)
+        elif not isinstance(order, Collator):
             return order(self[field])
-        except TypeError:
-            try:
-                return sort_key(order)(self[field])
-            except AttributeError:
-                return self[field]
+        return self._collate(field, order)
 
     def values(self):
         return (self[k] for k in self.keys())
 
 
+class Entry(EntryMethods, collections.UserDict):
+    """A dictionary entry.
+
+    Attributes:
+        parent: The Dictionary it is an entry in.
+        auto_values: A dict of the values of automatically generated fields,
+            whose keys are the fields, and whose values are tuples of the
+            value it was generated from, the version of the rules that
+            generated it (as returned by Dictionary._auto_version), and the
+            generated value.
+        sort_keys: A dict of the sort keys computed by order_key, whose keys
+            are tuples of the field and the Collator, and whose values are
+            tuples of the value of the field the key was computed from, and
+            the key.
+    """
+
+    def __init__(self, e=None, parent=None):
+        """Initializes an Entry.
+
+        Args:
+            e: A dict or str to initialize the Entry with. If a str, it is
+                converted to an Entry using parent.pat and parent.pat_args.
+                Otherwise, it is initialized as if e was passed to dict().
+                Defaults to {}.
+            parent: The Dictionary that contains the Entry. Defaults to a new,
+                empty Dictionary.
+        """
+        self.parent = Dictionary() if parent is None else parent
+        self.sort_keys = {}
+        self.auto_values = {}
+        if e is None:
+            e = {}
+        super().__init__()
+        # fill in the data directly, since the Entry isn't in parent yet
+        self.data.update(entry_data(e, self.parent.pat, self.parent.pat_args))
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self.parent.auto_fields
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.parent._field_changed(key)
+
+    def __getitem__(self, key):
+        if key in self.data:
+            return super().__getitem__(key)
+        return self._auto_field(key)
+
+    def __iter__(self):
+        yield from self.data.keys() | self.parent.auto_fields.keys()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.parent._field_changed(key)
+
+    def _store_auto(self, key, source, version, value):
+        """Stores the value of an automatically generated field."""
+        self.auto_values[key] = source, version, value
+
+    def _stored_auto(self, key):
+        """Returns the stored value of an automatically generated field.
+
+        Returns:
+            A tuple of the value it was generated from, the version of the
+            rules that generated it, and the value, or None if it hasn't been
+            generated.
+        """
+        return self.auto_values.get(key)
+
+    def _collate(self, field, order):
+        """Returns the sort key of a field, given a Collator.
+
+        Keys are cached until the field changes.
+        """
+        value = self[field]
+        try:
+            old, key = self.sort_keys[field, order]
+            if old == value:
+                return key
+        except KeyError:
+            pass
+        key = order(value)
+        self.sort_keys[field, order] = value, key
+        return key
+
+
+class Row(EntryMethods, collections.abc.MutableMapping):
+    """An entry in a ColumnarDictionary.
+
+    A Row doesn't store any fields itself, but reads and writes the columns
+    of its parent. It refers to a position in the parent, so inserting or
+    deleting entries before it makes it refer to a different entry.
+
+    Attributes:
+        parent: The ColumnarDictionary it is an entry in.
+        index: The position of the entry in parent.
+    """
+    __slots__ = ('parent', 'index')
+
+    def __init__(self, parent, index):
+        """Initializes a Row.
+
+        Args:
+            parent: The ColumnarDictionary containing the entry.
+            index: The position of the entry in parent.
+        """
+        self.parent = parent
+        self.index = index
+
+    def __contains__(self, key):
+        column = self.parent.columns.get(key)
+        if column is not None and column[self.index] is not None:
+            return True
+        return key in self.parent.auto_fields
+
+    def __delitem__(self, key):
+        column = self.parent.columns.get(key)
+        if column is None or column[self.index] is None:
+            raise KeyError(key)
+        column[self.index] = None
+        self.parent._field_changed(key)
+
+    def __getitem__(self, key):
+        column = self.parent.columns.get(key)
+        if column is not None:
+            value = column[self.index]
+            if value is not None:
+                return value
+        return self._auto_field(key)
+
+    def __iter__(self):
+        yield from self.data.keys() | self.parent.auto_fields.keys()
+
+    def __len__(self):
+        return len(self.data.keys() | self.parent.auto_fields.keys())
+
+    def __repr__(self):
+        return 'Row({!r})'.format(self.data)
+
+    def __setitem__(self, key, value):
+        column = self.parent.columns.get(key)
+        if column is None:
+            column = self.parent._new_column(sys.intern(key))
+        column[self.index] = intern(value)
+        self.parent._field_changed(key)
+
+    def _store_auto(self, key, source, version, value):
+        """Stores the value of an automatically generated field."""
+        column = self.parent.auto_columns.get(key)
+        if column is None or column[0] != version:
+            # values generated by other versions are out of date
+            n = len(self.parent)
+            column = self.parent.auto_columns[key] = (version, [None] * n,
+                                                      [None] * n)
+        column[1][self.index] = source
+        column[2][self.index] = value
+
+    def _stored_auto(self, key):
+        """Returns the stored value of an automatically generated field.
+
+        Returns:
+            A tuple of the value it was generated from, the version of the
+            rules that generated it, and the value, or None if it hasn't been
+            generated.
+        """
+        column = self.parent.auto_columns.get(key)
+        if column is None:
+            return None
+        version, sources, values = column
+        return sources[self.index], version, values[self.index]
+
+    @property
+    def data(self):
+        """A dict of the stored fields of the entry."""
+        return {k: column[self.index]
+                for k, column in self.parent.columns.items()
+                if column[self.index] is not None}
+
+
+class JSONLReader(object):
+    """Reads a Dictionary written by to_JSONL, one Entry at a time.
+
+    Iterating over a JSONLReader yields a dict for each Entry, as it is read
+    from the file. It can be used as a context manager, which closes the
+    file.
+
+    Attributes:
+        alpha: The alphabetical ordering of the Dictionary.
+        pat: The default pattern of the Dictionary.
+        pat_args: The default pattern arguments of the Dictionary.
+        auto_fields: The automatically generated fields of the Dictionary.
+        file: The file being read.
+    """
+
+    def __init__(self, filename):
+        """Opens a file and reads its header.
+
+        Args:
+            filename: The path to the file to read.
+
+        Raises:
+            ValueError: The file doesn't start with a Dictionary header.
+        """
+        self.file = open(os.path.expanduser(filename), encoding='utf-8')
+        try:
+            header = json.loads(self.file.readline())['__Dictionary__']
+        except (ValueError, KeyError, TypeError):
+            self.file.close()
+            raise ValueError('{} has no Dictionary header'.format(filename))
+        self.alpha = header.get('alpha')
+        self.pat = header.get('pat')
+        self.pat_args = header.get('pat_args')
+        self.auto_fields = header.get('auto_fields')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        for line in self.file:
+            if line.strip():
+                yield json.loads(line)
+
+    def close(self):
+        """Closes the file."""
+        self.file.close()
+
+
+class NGramIndex(object):
+    """An index of the character n-grams in one field of a Dictionary.
+
+    Attributes:
+        field: The field indexed.
+        n: The length of the longest n-grams indexed. Every n-gram from 2
+            characters long to n characters long is indexed, so that strings
+            shorter than n can be looked up.
+        postings: A dict whose keys are n-grams, and whose values are sets of
+            the indices of the Entries whose field contains them.
+    """
+
+    def __init__(self, field, entries=(), n=3):
+        """Initializes an index.
+
+        Args:
+            field: The field to index.
+            entries: (Optional) The Entries to index, in order. Defaults to
+                none.
+            n: (Optional) The length of the longest n-grams to index. Defaults
+                to 3.
+        """
+        self.field = field
+        self.n = n
+        self.postings = collections.defaultdict(set)
+        for i, e in enumerate(entries):
+            self.add(i, e)
+
+    def grams(self, s):
+        """Returns the set of n-grams in a string."""
+        return {s[i:i + k] for k in range(2, self.n + 1)
+                for i in range(len(s) - k + 1)}
+
+    def add(self, i, entry):
+        """Adds an Entry to the index.
+
+        Args:
+            i: The index of the Entry in the Dictionary.
+            entry: The Entry.
+        """
+        value = entry.get(self.field)
+        if isinstance(value, str):
+            for g in self.grams(value):
+                self.postings[g].add(i)
+
+    def remove(self, i, entry):
+        """Removes an Entry from the index.
+
+        Args:
+            i: The index of the Entry in the Dictionary.
+            entry: The Entry, as it was when it was added.
+        """
+        value = entry.get(self.field)
+        if isinstance(value, str):
+            for g in self.grams(value):
+                posting = self.postings.get(g)
+                if posting is not None:
+                    posting.discard(i)
+                    if not posting:
+                        del self.postings[g]
+
+    def lookup(self, s):
+        """Finds the Entries whose field could contain a string.
+
+        Args:
+            s: The string to look up.
+
+        Returns:
+            A set of the indices of the Entries which contain every n-gram of
+            s, or None if s is too short to look up.
+        """
+        if len(s) < 2:
+            return None
+        k = min(len(s), self.n)
+        # start with the rarest n-gram, so the set stays small
+        grams = sorted({s[i:i + k] for i in range(len(s) - k + 1)},
+                       key=lambda g: len(self.postings.get(g, ())))
+        out = set(self.postings.get(grams[0], ()))
+        for g in grams[1:]:
+            if not out:
+                break
+            out &= self.postings.get(g, set())
+        return out
+
+    def candidates(self, requirements):
+        """Finds the Entries which could meet a set of requirements.
+
+        Args:
+            requirements: A list of tuples of strings, as returned by
+                search_requirements. For each tuple, the field must contain
+                at least one of its strings.
+
+        Returns:
+            A set of the indices of the Entries which could meet every
+            requirement, or None if none of the requirements can be looked up.
+        """
+        out = None
+        for alts in requirements:
+            found = set()
+            for a in alts:
+                indices = self.lookup(a)
+                if indices is None:
+                    # one alternative can't be looked up, so neither can the
+                    # requirement
+                    break
+                found |= indices
+            else:
+                out = found if out is None else out & found
+        return out
+
+
+class Search(object):
+    """A search, compiled once to be checked against many values.
+
+    Attributes:
+        pattern: The compiled regex, if searching using plain regex, or None.
+        rule: The sound_changer.CompiledRule, if searching using sound change
+            rule syntax, or None.
+        requirements: A list of tuples of strings, as returned by
+            search_requirements.
+    """
+
+    def __init__(self, s, cats=None):
+        """Compiles a search.
+
+        Args:
+            s: The string to search for. If cats is specified, can use sound
+                change rule syntax, and can already be parsed with
+                sound_changer.parse_rule.
+            cats: (Optional) The categories to use if searching using sound
+                change rule syntax.
+        """
+        if cats is None:
+            # treat s as plain regex
+            self.pattern = regex.compile(s)
+            self.rule = None
+            self.requirements = search_requirements(s)
+        else:
+            # s is a sound change rule
+            try:
+                s = sound_changer.parse_rule(s, cats)
+            except AttributeError:
+                # s is a dict (i.e. already parsed)
+                pass
+            self.pattern = None
+            self.rule = sound_changer.CompiledRule(s, cats)
+            self.requirements = self.rule.requirements
+
+    def check(self, value):
+        """Checks whether a value matches the search."""
+        if self.rule is None:
+            return self.pattern.search(value) is not None
+        return bool(self.rule.find_matches(value)[0])
+
+    def spans(self, value):
+        """Returns a list of the spans of the matches of the search in a value.
+        """
+        if self.rule is None:
+            return [m.span() for m in self.pattern.finditer(value)]
+        return [m.span() for m in self.rule.find_matches(value)[0]]
+
+
+def search_requirements(s):
+    """Finds strings which must be present in any match of a regex search.
+
+    Searches using sound change rule syntax get their requirements from their
+    sound_changer.CompiledRule instead.
+
+    Args:
+        s: The regex searched for, as passed to Entry.check.
+
+    Returns:
+        A list of tuples of strings, as returned by
+        sound_changer.required_literals. If nothing can be determined about
+        the search, the list is empty.
+    """
+    if not isinstance(s, str):
+        # a compiled pattern, which could have any flags
+        return []
+    return sound_changer.required_literals(s, {})
+
+
+class Collator(object):
+    """A sorting key function for an alphabetical ordering.
+
+    Attributes:
+        alpha: A dict, with key/value pairs corresponding to characters or
+            sequences of characters, and the order they should be sorted at,
+            as described in sort_key.
+        pattern: The compiled regex matching each sequence of characters in
+            alpha, longest first, or any other single character.
+    """
+
+    def __init__(self, alpha):
+        """Initializes a Collator.
+
+        Args:
+            alpha: A dict, as described in sort_key.
+        """
+        self.alpha = alpha
+        a = sorted(alpha.keys(), key=lambda x: -len(x))
+        # with an empty ordering, the group can't match, but is still there
+        items = '|'.join(regex.escape(k) for k in a) or '(?!)'
+        self.pattern = regex.compile('(' + items + ')|.')
+
+    def __call__(self, word):
+        """Generates a sort key.
+
+        Args:
+            word: The string to generate a key for.
+
+        Returns:
+            A list of the positions in the ordering of each character or
+            sequence of characters in word, with -1 for characters not in the
+            ordering.
+        """
+        out = []
+        for m in self.pattern.finditer(word):
+            if m.group(1):
+                pos = self.alpha[m.group(1)]
+                if pos is not None:
+                    out.append(pos)
+            else:
+                out.append(-1)
+        return out
+
+
+# The Collators built by sort_key, keyed by the items of their orderings.
+collators = cache.Cache(lambda items: Collator(dict(items)))
+
+
 def sort_key(alpha):
     """Converts a dict to a sorting key function.
 
@@ -536,7 +1925,8 @@ def sort_key(alpha):
             same index.
 
     Returns:
-        A function, which when applied to a string, generates a sort key.
+        A Collator, which when applied to a string, generates a sort key. The
+        same Collator is returned for the same ordering.
     """
     if not isinstance(alpha, dict):
         # alpha *should* be a dict, but if passed a list or a string, treat it
@@ -546,16 +1936,4 @@ def sort_key(alpha):
         except TypeError:
             # alpha isn't iterable, and is therefore useless as a key
             alpha = {}
-    a = sorted(alpha.keys(), key=lambda x: -len(x))
-
-    def key(word):
-        out = []
-        for m in regex.finditer('(' + '|'.join(a) + ')|.', word):
-            if m.group(1):
-                if alpha[m[0]] is not None:
-                    out.append(alpha[m[0]])
-            else:
-                out.append(-1)
-        return out
-
-    return key
+    return collators(frozenset(alpha.items()))
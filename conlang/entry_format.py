@@ -14,6 +14,8 @@ default_pat_args = {
     'de': ': $de'
 }
 
+# The regular expressions generated by match, keyed by pat and pat_args
+matchers = {}
 
 
 def match(pat=None, pat_args=None):
@@ -39,8 +41,14 @@ def match(pat=None, pat_args=None):
     Returns:
         A regular expression which will match a dictionary entry in the
         specified format. Fields mentioned in the pattern with '$' can be
-        accessed as named capture groups of the match object.
+        accessed as named capture groups of the match object. The same
+        regular expression is returned for the same pat and pat_args.
     """
+    key = pat, None if pat_args is None else tuple(sorted(pat_args.items()))
+    try:
+        return matchers[key]
+    except KeyError:
+        pass
     if pat is None:
         pat = default_pat
         if pat_args is None:
@@ -62,8 +70,10 @@ def match(pat=None, pat_args=None):
         pat = workers.slice_replace(pat, sp,
                                     '({})?'.format(args.get(f, var_group(f))))
         m = var_match.search(pat)
-    pat = pat.replace(' ', r'\s+')
-    return regex.compile(pat)
+    # newer versions of regex.escape escape spaces too
+    pat = pat.replace('\\ ', ' ').replace(' ', r'\s+')
+    matchers[key] = regex.compile(pat)
+    return matchers[key]
 
 def output(entry, pat, pat_args):
     """Generates a string from an entry using the specified format.
@@ -220,7 +220,7 @@ class InflectionRule(list):
             word = entry[self.field]
         except TypeError:
             word = entry
-        return sound_changer.apply_rule_list(word, rules)[0]
+        return sound_changer.apply_rule_list(word, rules, False)[0]
 
     def __getattr__(self, attr):
         if attr == 'field':
@@ -1,11 +1,139 @@
+import collections
+import concurrent.futures
+import hashlib
+import io
 import os
+import pickle
 import regex
+import sys
+import tempfile
 from os import path
 from soundchanger.conlang import cache, workers
 
 regex.DEFAULT_VERSION = regex.VERSION1
 
 cat_matcher = regex.compile(r'\{(\d*):?(\w*)\}')
+# matches inline flags, and other groups which aren't lookarounds or
+# non-capturing groups
+flag_matcher = regex.compile(r'\(\?(?![:=!]|<[=!])')
+
+# The version of the compiled rule cache format. Changing it causes existing
+# cache files to be ignored.
+CACHE_VERSION = 3
+
+
+def is_literal(item):
+    """Checks whether a string matches only itself when used as a pattern."""
+    return bool(item) and regex.escape(item, special_only=True) == item
+
+
+def trie_pattern(items):
+    """Generates a pattern matching any of a list of items.
+
+    Items which are plain strings are combined into a trie, so that items
+    sharing a prefix share a branch of the pattern, and longer items are tried
+    before their prefixes, for example 't(?:s|ʃ)?' rather than 't|ts|tʃ'.
+    If any items are regex patterns, which can't be put in the trie, the items
+    are instead joined as alternatives, longest first.
+
+    Args:
+        items: The list of items to match.
+
+    Returns:
+        A pattern that matches any of the items, preferring longer items.
+    """
+    if not all(map(is_literal, items)):
+        return '|'.join(sorted(items, key=len, reverse=True))
+    trie = {}
+    for item in items:
+        node = trie
+        for ch in item:
+            node = node.setdefault(ch, {})
+        # '' marks the end of an item
+        node[''] = {}
+
+    def render(node):
+        end = '' in node
+        leaves = [ch for ch in node if ch and node[ch] == {'': {}}]
+        branches = [ch + render(child) for ch, child in node.items()
+                    if ch and ch not in leaves]
+        cls = '[' + ''.join(leaves) + ']'
+        if len(leaves) > 1:
+            branches.append(cls)
+        else:
+            branches += leaves
+        if not branches:
+            return ''
+        if len(branches) == 1:
+            alt = branches[0]
+            if end and len(alt) > 1 and alt != cls:
+                # the optional part is more than one character
+                alt = '(?:' + alt + ')'
+        else:
+            alt = '(?:' + '|'.join(branches) + ')'
+        return alt + '?' if end else alt
+
+    return render(trie)
+
+
+class Category(list):
+    """A category, indexed for looking up the index of an item.
+
+    Items which are plain strings are looked up in a dict, so only items which
+    are actually regex patterns need to be matched against.
+
+    Attributes:
+        literals: A dict whose keys are the items of the category which are
+            plain strings, and whose values are the first index of each.
+        patterns: A list of tuples of the index and the text of each item of
+            the category which is a regex pattern.
+        pattern: A pattern matching any item of the category, as generated
+            by trie_pattern.
+    """
+
+    def __init__(self, items=()):
+        """Initializes a category.
+
+        Args:
+            items: (Optional) The items of the category. Defaults to ().
+        """
+        super().__init__(items)
+        self.literals = {}
+        self.patterns = []
+        self._compiled = {}
+        for i, item in enumerate(self):
+            if is_literal(item):
+                self.literals.setdefault(item, i)
+            else:
+                self.patterns.append((i, item))
+        self.pattern = trie_pattern(self)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # compiled patterns are recompiled as needed
+        state['_compiled'] = {}
+        return state
+
+    def find(self, s):
+        """Returns the index of the first item of the category matching s.
+
+        Args:
+            s: The string to look up.
+
+        Returns:
+            The index of the first item which matches all of s, or -1 if no
+            item matches.
+        """
+        idx = self.literals.get(s, -1)
+        for i, item in self.patterns:
+            if idx != -1 and i > idx:
+                # the literal match comes first
+                break
+            if item not in self._compiled:
+                self._compiled[item] = regex.compile('^{}$'.format(item))
+            if self._compiled[item].match(s):
+                return i
+        return idx
 
 
 def cat_replace(m, cats):
@@ -20,18 +148,22 @@ def cat_replace(m, cats):
 
     Returns:
         If there is no number, a pattern that simply matches every item in the
-        category. If there is a number, the pattern will additionally capture
-        the match to a named group, 'nc' + n + '_' + c, where n is the number,
-        and c is the name of the category. If the name of the category is not
-        found in cats, the original string is returned.
+        category, preferring longer items, as generated by trie_pattern. If
+        there is a number, the pattern will additionally capture the match to
+        a named group, 'nc' + n + '_' + c, where n is the number, and c is the
+        name of the category. If the name of the category is not found in
+        cats, the original string is returned.
     """
     n, c = m.groups()
     if c in cats:
+        try:
+            pattern = cats[c].pattern
+        except AttributeError:
+            # cats[c] is a plain list, rather than a Category
+            pattern = trie_pattern(cats[c])
         if not n:
-            return '(' + '|'.join(cats[c]) + ')'
-        return '(?P<nc{}_{}>{})'.format(n, c, '|'.join(sorted(cats[c],
-                                                              key=len,
-                                                              reverse=True)))
+            return '(?:' + pattern + ')'
+        return '(?P<nc{}_{}>{})'.format(n, c, pattern)
     return m.group(0)
 
 
@@ -62,6 +194,60 @@ def to_cat_replace(m, cats, indices):
         return cats[c][indices['nc' + n]]
     return m.group(0)
 
+def compile_to(to, cats):
+    """Compiles the output of a sound change into a template.
+
+    Args:
+        to: The 'to' field of the rule.
+        cats: The dict of categories to use in replacement.
+
+    Returns:
+        A list whose items are either strings, which are output as-is, or
+        tuples of a numbered category index key ('nc' + n, where n is the
+        number), the name of the category, and the original text, which are
+        filled in by fill_template.
+    """
+    template = []
+    pos = 0
+    for m in cat_matcher.finditer(to):
+        n, c = m.groups()
+        template.append(to[pos:m.start()])
+        if c in cats and n != '':
+            template.append(('nc' + n, c, m.group(0)))
+        else:
+            # this isn't a numbered category, so it's output as-is
+            template[-1] += m.group(0)
+        pos = m.end()
+    template.append(to[pos:])
+    return template
+
+
+def fill_template(template, cats, indices):
+    """Produces the output of a sound change from a template.
+
+    Args:
+        template: The template, as returned by compile_to.
+        cats: The dict of categories to use in replacement.
+        indices: The dict of numbered category indices to use in replacement,
+            as in to_cat_replace.
+
+    Returns:
+        The output of the sound change, with each numbered category replaced
+        as in to_cat_replace.
+    """
+    out = []
+    for t in template:
+        if isinstance(t, str):
+            out.append(t)
+        elif t[0] in indices:
+            item = cats[t[1]][indices[t[0]]]
+            # treat '0' as '', to allow for categories with gaps
+            out.append('' if item == '0' else item)
+        else:
+            out.append(t[2])
+    return ''.join(out)
+
+
 def compile_rule(rule, cats):
     """Converts a rule into a regex pattern
 
@@ -92,6 +278,97 @@ def compile_rule(rule, cats):
     return pattern
 
 
+def required_literals(pattern, cats):
+    """Finds strings which must be present in any match of a pattern.
+
+    The analysis is conservative: anything it doesn't understand, such as
+    groups, character classes, escapes, alternation, and quantified items, is
+    skipped, so the requirements it finds are always necessary, but not
+    necessarily sufficient, for the pattern to match.
+
+    Args:
+        pattern: The pattern, before categories are expanded.
+        cats: The dict of categories to use in matching.
+
+    Returns:
+        A list of tuples of strings. For each tuple, at least one of its
+        strings is present in any string the pattern matches. If nothing can
+        be determined about the pattern, the list is empty.
+    """
+    if '|' in pattern or '\\' in pattern or '(?' in pattern:
+        # too complicated to analyse
+        return []
+    # each token is a tuple of the alternatives it can match (or None if it's
+    # not understood) and whether it is required
+    tokens = []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        m = cat_matcher.match(pattern, i)
+        if m and m.group(2) in cats:
+            cat = cats[m.group(2)]
+            if all(is_literal(item) for item in cat):
+                tokens.append((tuple(cat) if depth == 0 else None, True))
+            else:
+                tokens.append((None, True))
+            i = m.end()
+            continue
+        if ch in '?*{':
+            # the previous item is optional
+            if tokens:
+                tokens[-1] = (tokens[-1][0], False)
+            if ch == '{':
+                i = pattern.find('}', i)
+                if i == -1:
+                    return []
+            i += 1
+            # lazy or possessive quantifiers
+            while i < len(pattern) and pattern[i] in '?+':
+                i += 1
+            continue
+        if ch == '+':
+            # the previous item is still required, but may be repeated, so it
+            # ends the run of characters
+            tokens.append((None, False))
+            i += 1
+            while i < len(pattern) and pattern[i] in '?+':
+                i += 1
+            continue
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == '[':
+            # skip the character class, allowing for ']' as its first item,
+            # even if the class is negated
+            start = i + 2 if pattern.startswith('^', i + 1) else i + 1
+            end = pattern.find(']', start + 1)
+            if end == -1 or '[' in pattern[i + 1:end]:
+                # nested sets are too complicated to analyse
+                return []
+            i = end
+            ch = None
+        if ch is None or ch in '()^$.' or depth > 0:
+            tokens.append((None, True))
+        else:
+            tokens.append(((ch,), True))
+        i += 1
+    # combine runs of required single characters into strings
+    out = []
+    run = ''
+    for alts, required in tokens + [(None, False)]:
+        if required and alts is not None and len(alts) == 1:
+            run += alts[0]
+            continue
+        if run:
+            out.append((run,))
+            run = ''
+        if required and alts is not None:
+            out.append(alts)
+    return out
+
+
 def find_matches(word, rule, cats):
     """Finds all matches of a rule in a word.
 
@@ -114,23 +391,7 @@ def find_matches(word, rule, cats):
         where n is the number of that category, and values corresponding to the
         index associated with that numbered category.
     """
-    # First, generate a regex pattern to search for
-    pattern = compile_rule(rule, cats)
-    # Now pattern is a valid regex
-    matches = []
-    cat_index = []
-    for m in regex.finditer(pattern, word):
-        # For each match, check that the numbered categories match, and
-        # populate cat_index with the indices associate with each one
-        try:
-            cat_index.append(numbered_categories(m, cats))
-            matches.append(m)
-        except ValueError:
-            # The numbered categories didn't match
-            pass
-    # Each match in matches is a valid match, since those that had mismatching
-    # numbered categories were never added to it.
-    return matches, cat_index
+    return CompiledRule(rule, cats).find_matches(word)
 
 
 def numbered_categories(m, cats):
@@ -163,11 +424,13 @@ def numbered_categories(m, cats):
                     # a previous number/category pair had a different index
                     raise ValueError()
             else:
-                idx = [i for i, item in enumerate(cats[c])
-                        if regex.match('^{}$'.format(item), captures[nc][0])]
-                if not idx:
+                cat = cats[c]
+                if not isinstance(cat, Category):
+                    cat = Category(cat)
+                idx = cat.find(captures[nc][0])
+                if idx == -1:
                     raise ValueError()
-                indices[n] = idx[0]
+                indices[n] = idx
     return indices
 
 
@@ -192,7 +455,7 @@ def apply_rule(word, rule, cats):
     return apply_to_matches(word, rule['to'], cats, matches, cat_index)
 
 
-def apply_to_matches(word, to, cats, matches, cat_index):
+def apply_to_matches(word, to, cats, matches, cat_index, template=None):
     """Applies a sound change to a word, after matches have been found.
 
     Args:
@@ -201,6 +464,8 @@ def apply_to_matches(word, to, cats, matches, cat_index):
         cats: The dict of categories to use in replacement.
         matches: The list of matches.
         cat_index: The list of numbered category indices for the matches.
+        template: (Optional) The 'to' field compiled by compile_to. If not
+            given, it is compiled from to.
 
     Returns:
         The result of the sound change.
@@ -208,15 +473,20 @@ def apply_to_matches(word, to, cats, matches, cat_index):
     if not matches:
         # there were no matches, so no changes need to be applied
         return word
-    # starting from the end of the string, replace each match with the output
-    # of the rule
-    for match, indices in zip(reversed(matches), reversed(cat_index)):
-        # produce the appropriate replacement, given numbered categories, and
-        # insert it into the word
-        word = workers.slice_replace(
-            word, match.span(),
-            cat_matcher.sub(lambda m: to_cat_replace(m, cats, indices), to))
-    return word
+    if template is None:
+        template = compile_to(to, cats)
+    # the matches don't overlap, and are in order, so the output can be built
+    # in a single pass from the start of the string
+    out = []
+    pos = 0
+    for match, indices in zip(matches, cat_index):
+        start, end = match.span()
+        out.append(word[pos:start])
+        # produce the appropriate replacement, given numbered categories
+        out.append(fill_template(template, cats, indices))
+        pos = end
+    out.append(word[pos:])
+    return ''.join(out)
 
 
 def apply_alternate_rules(word, rules, cats):
@@ -236,6 +506,7 @@ def apply_alternate_rules(word, rules, cats):
         matches, cat_index = find_matches(word, rule, cats)
         if matches:
             return apply_to_matches(word, rule['to'], cats, matches, cat_index)
+    return word
 
 
 def parse_rule(l, cats):
@@ -323,38 +594,413 @@ def parse_rule(l, cats):
     return out
 
 
-def apply_rule_list(word, lines):
+class CompiledRule(object):
+    """A sound change rule, compiled for repeated application.
+
+    Attributes:
+        rule: The rule, as a dict in the format returned by parse_rule.
+        cats: The dict of categories in effect for the rule.
+        source: The regex pattern that matches where the rule applies, as
+            generated by compile_rule.
+        pattern: source, compiled. When a CompiledRule is unpickled, this is
+            only recompiled the first time it is used.
+        template: The 'to' field of the rule, compiled by compile_to.
+        requirements: A list of tuples of strings, as returned by
+            required_literals, used to skip words the rule can't match.
+        first_chars: A list of frozensets of the first characters of each
+            tuple of requirements.
+    """
+
+    def __init__(self, rule, cats):
+        """Initializes a compiled rule.
+
+        Args:
+            rule: The rule to compile, as a dict in the format returned by
+                parse_rule.
+            cats: The dict of categories to use in search and replacement.
+        """
+        self.rule = rule
+        self.cats = cats
+        self.source = compile_rule(rule, cats)
+        self._pattern = regex.compile(self.source)
+        self.template = compile_to(rule.get('to', ''), cats)
+        if any(flag_matcher.search(rule.get(k, ''))
+               for k in ('before', 'unbefore', 'after', 'unafter')):
+            # inline flags could change how 'from' matches. Lookarounds,
+            # such as the ones '#' is expanded to, can't
+            self.requirements = []
+        else:
+            self.requirements = required_literals(rule['from'], cats)
+        self.first_chars = [frozenset(a[0] for a in alts)
+                            for alts in self.requirements]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # recompile the pattern when it's first used, rather than when it's
+        # unpickled, since most rules in a file don't apply to most words
+        state['_pattern'] = None
+        return state
+
+    @property
+    def pattern(self):
+        if self._pattern is None:
+            self._pattern = regex.compile(self.source)
+        return self._pattern
+
+    def can_match(self, word, chars=None):
+        """Checks whether the rule could match a word.
+
+        Args:
+            word: The word to check.
+            chars: (Optional) The set of characters in word. If given, it is
+                used to rule out most words without searching the word.
+
+        Returns:
+            False if the rule can't match the word. True if it might.
+        """
+        if chars is not None:
+            for first in self.first_chars:
+                if chars.isdisjoint(first):
+                    return False
+        for alts in self.requirements:
+            if len(alts) == 1 and alts[0] not in word:
+                return False
+        return True
+
+    def find_matches(self, word, chars=None):
+        """Finds all matches of the rule in a word.
+
+        Args:
+            word: The word to search in.
+            chars: (Optional) The set of characters in word, as in can_match.
+
+        Returns:
+            A tuple of a list of match objects, and a list of the corresponding
+            numbered category index dicts, as in find_matches.
+        """
+        matches = []
+        cat_index = []
+        if not self.can_match(word, chars):
+            return matches, cat_index
+        for m in self.pattern.finditer(word):
+            # For each match, check that the numbered categories match, and
+            # populate cat_index with the indices associate with each one
+            try:
+                cat_index.append(numbered_categories(m, self.cats))
+                matches.append(m)
+            except ValueError:
+                # The numbered categories didn't match
+                pass
+        # Each match in matches is a valid match, since those that had
+        # mismatching numbered categories were never added to it.
+        return matches, cat_index
+
+    def apply(self, word, chars=None):
+        """Applies the rule to a word.
+
+        Args:
+            word: The word to apply the rule to.
+            chars: (Optional) The set of characters in word, as in can_match.
+
+        Returns:
+            The result of the sound change.
+        """
+        matches, cat_index = self.find_matches(word, chars)
+        return apply_to_matches(word, self.rule['to'], self.cats, matches,
+                                cat_index, self.template)
+
+
+TraceStep = collections.namedtuple(
+    'TraceStep', ['index', 'line', 'before', 'after', 'spans', 'changed'])
+TraceStep.__doc__ = """A record of one step of applying a CompiledRuleList.
+
+Attributes:
+    index: The index of the step in the CompiledRuleList.
+    line: The line the step was compiled from.
+    before: The word before the step.
+    after: The word after the step.
+    spans: A list of the spans of the matches that were replaced, or None if
+        the step is a category.
+    changed: Whether the step changed the word.
+"""
+
+
+class Trace(list):
+    """A list of TraceSteps, recording how a word was changed.
+
+    Attributes:
+        changed_only: If True, only steps that changed the word are recorded.
+    """
+
+    def __init__(self, changed_only=False):
+        """Initializes a trace.
+
+        Args:
+            changed_only: (Optional) Whether to only record steps that change
+                the word. Defaults to False.
+        """
+        super().__init__()
+        self.changed_only = changed_only
+
+    def add(self, index, line, before, after, spans=None):
+        """Records a step, unless it should be left out.
+
+        Args:
+            index: The index of the step.
+            line: The line the step was compiled from.
+            before: The word before the step.
+            after: The word after the step.
+            spans: (Optional) A list of the spans of the matches that were
+                replaced. Should be None for categories.
+        """
+        changed = before != after
+        if changed or not self.changed_only:
+            self.append(TraceStep(index, line, before, after, spans, changed))
+
+    def format(self):
+        """Formats the trace as a string.
+
+        Returns:
+            The trace, with one line per step. Categories are listed as-is, and
+            rules are followed by the word after they were applied.
+        """
+        return '\n'.join(step.line if step.spans is None
+                         else step.line + ' ' + step.after for step in self)
+
+
+class CompiledRuleList(object):
+    """A list of sound change rules, parsed and compiled once.
+
+    Categories are resolved as the list is compiled, so each rule carries the
+    categories that were defined before it, and applying the list to a word
+    only runs the precompiled patterns.
+
+    Attributes:
+        lines: The list of sound changes the rule list was compiled from.
+        steps: A list of tuples of a line and its compiled form. The compiled
+            form is None for categories, a CompiledRule for a single rule, or
+            a list of CompiledRules for a list of alternate rules.
+        cats: The dict of categories defined by the end of the list.
+    """
+
+    def __init__(self, lines):
+        """Compiles a list of sound change rules.
+
+        Args:
+            lines: The list of sound changes to compile. Each item is either a
+                line to be parsed with parse_rule, or an already parsed rule.
+        """
+        self.lines = list(lines)
+        self.steps = []
+        cats = {}
+        for l in self.lines:
+            try:
+                rc = parse_rule(l, cats)
+            except AttributeError:
+                # l wasn't a string, but rather a dict
+                rc = l
+            if 'cat_name' in rc:
+                # copy the categories, so that rules compiled earlier keep the
+                # categories that were in effect for them
+                cats = dict(cats)
+                cats[rc['cat_name']] = Category(rc['category'])
+                self.steps.append((l, None))
+            elif 'from' in rc:
+                self.steps.append((l, CompiledRule(rc, cats)))
+            else:
+                self.steps.append((l, [CompiledRule(r, cats) for r in rc]))
+        self.cats = cats
+        self._size = None
+
+    def __sizeof__(self):
+        # estimate the size of the rules, rather than just the object, so that
+        # caches of compiled files can be bounded by size
+        if self._size is None:
+            size = cache.estimate_size(self.lines)
+            for l, rc in self.steps:
+                for r in [rc] if isinstance(rc, CompiledRule) else rc or []:
+                    # the compiled pattern is assumed to take several times
+                    # the size of its source
+                    size += 4 * sys.getsizeof(r.source)
+                    size += cache.estimate_size(r.template)
+            self._size = size
+        return object.__sizeof__(self) + self._size
+
+    def apply(self, word, trace=None):
+        """Applies the rules to a word.
+
+        Args:
+            word: The word to apply the rules to.
+            trace: (Optional) A Trace to record each step in. If None
+                (default), nothing is recorded.
+
+        Returns:
+            The final result of the sound changes.
+        """
+        # the characters in the word are used to skip rules which can't match
+        # it, and only need to be recomputed when the word changes
+        chars = set(word)
+        for i, (l, rc) in enumerate(self.steps):
+            if rc is None:
+                if trace is not None:
+                    trace.add(i, l, word, word)
+                continue
+            before = word
+            # a single rule is treated as a list of one alternative
+            for r in [rc] if isinstance(rc, CompiledRule) else rc:
+                matches, cat_index = r.find_matches(word, chars)
+                if matches:
+                    out = apply_to_matches(word, r.rule['to'], r.cats,
+                                           matches, cat_index, r.template)
+                    if out != word:
+                        word = out
+                        chars = set(word)
+                    break
+            if trace is not None:
+                trace.add(i, l, before, word, [m.span() for m in matches])
+        return word
+
+
+def compile_rule_list(lines):
+    """Returns lines as a CompiledRuleList, compiling it if necessary."""
+    if isinstance(lines, CompiledRuleList):
+        return lines
+    return CompiledRuleList(lines)
+
+
+def load_rule_file(filename):
+    """Loads and compiles a sound change file, using the compiled rule cache.
+
+    Compiled files are cached in workers.FILE_PATH + '/cache/', along with the
+    modification time and a hash of the file they were compiled from. If the
+    modification time matches, the cached version is used without reading the
+    file. Otherwise, if the hash matches, the cached version is used and its
+    modification time is updated. If neither matches, the file is compiled,
+    and the cache file is replaced atomically. If the cache can't be written,
+    the compiled file is still returned.
+
+    Args:
+        filename: The name of the file, relative to workers.FILE_PATH +
+            '/files/'.
+
+    Returns:
+        A CompiledRuleList.
+    """
+    file_path = workers.path_to_file(filename)
+    cache_path = workers.path_to_cache(filename + '.pickle')
+    mtime = cache.mtimes.getmtime(file_path)
+    digest = rules = None
+    try:
+        with open(cache_path, 'rb') as f:
+            version, cached_mtime, digest, rules = pickle.load(f)
+        if version != CACHE_VERSION:
+            digest = rules = None
+        elif cached_mtime == mtime:
+            return rules
+    except (OSError, EOFError, ValueError, TypeError, AttributeError,
+            ImportError, pickle.UnpicklingError):
+        # there's no usable cache file
+        pass
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    new_digest = hashlib.sha1(content).hexdigest()
+    if digest != new_digest:
+        text = io.StringIO(content.decode('utf-8'), newline=None)
+        rules = CompiledRuleList(workers.text_lines(text))
+    try:
+        os.makedirs(path.dirname(cache_path), exist_ok=True)
+        f = tempfile.NamedTemporaryFile('wb', dir=path.dirname(cache_path),
+                                        delete=False)
+    except OSError:
+        # the cache isn't writable, so just don't cache it
+        return rules
+    try:
+        with f:
+            pickle.dump((CACHE_VERSION, mtime, new_digest, rules), f,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, cache_path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError,
+            RecursionError):
+        # don't leave the partly written file behind, and just don't cache it
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+    return rules
+
+
+def apply_rule_list(word, lines, debug=True):
     """Applies a list of sound change rules.
 
     Args:
         word: The word to apply the rules to.
-        lines: The list of sound changes to apply.
+        lines: The list of sound changes to apply, or a CompiledRuleList. A
+            CompiledRuleList should be used when applying the same rules to
+            many words, since it is only compiled once.
+        debug: (Optional) Whether to produce the debug info. Defaults to True.
 
     Returns:
         A tuple of the final result of the sound changes, and the debug info,
-        which lists each rule along with its outcome.
+        which lists each rule along with its outcome. If debug is False, the
+        debug info is ''.
     """
-    cats = {}
-    debug = []
-    for l in lines:
-        try:
-            rc = parse_rule(l, cats)
-        except AttributeError:
-            # l wasn't a string, but rather a dict
-            rc = l
-        if 'cat_name' in rc:
-            cats[rc['cat_name']] = rc['category']
-            debug.append(l)
+    if not debug:
+        return compile_rule_list(lines).apply(word), ''
+    trace = Trace()
+    word = compile_rule_list(lines).apply(word, trace)
+    return word, trace.format()
+
+
+def load_stages(pairs, file_loader=load_rule_file):
+    """Loads and compiles each sound change file in a set of pairs.
+
+    Args:
+        pairs: The list of pairs, in the same format as apply_rule_files.
+        file_loader: (Optional) A function that accepts filenames and returns
+            lists of sound changes or CompiledRuleLists. Defaults to
+            load_rule_file.
+
+    Returns:
+        A list of tuples of the name of each step on the way from the start to
+        the end of each pair, and the CompiledRuleList for that step.
+    """
+    return [(cur, compile_rule_list(file_loader(cur)))
+            for cur in pair_iterator(pairs)]
+
+
+def apply_stages(word, stages, start=None, debug=0):
+    """Applies a list of compiled sound change files.
+
+    Args:
+        word: The word to apply the changes to.
+        stages: A list of stages, as returned by load_stages.
+        start: (Optional) The name of the initial language, used in the debug
+            info. If None (default), the initial word isn't included in it.
+        debug: (Optional) The level of debug info to be included in the
+            output, as in apply_rule_files.
+
+    Returns:
+        A tuple of the final result of the sound changes, and the debug info.
+    """
+    db = []
+    # if any debug info is to be output, and there is at least one pair of
+    # languages, start by adding the initial language and word.
+    if start is not None and debug:
+        db.append(start + ': ' + word)
+    for cur, rules in stages:
+        if debug > 1:
+            trace = Trace(changed_only=debug > 2)
+            word = rules.apply(word, trace)
+            if trace or not trace.changed_only:
+                db.append(trace.format())
         else:
-            if 'from' in rc:
-                word = apply_rule(word, rc, cats)
-            else:
-                word = apply_alternate_rules(word, rc, cats)
-            debug.append(l + ' ' + word)
-    return word, '\n'.join(debug)
+            word = rules.apply(word)
+        if debug:
+            db.append(cur + ': ' + word)
+    return word, '\n'.join(db)
 
 
-def apply_rule_files(word, pairs, debug=0, file_loader=workers.lf):
+def apply_rule_files(word, pairs, debug=0, file_loader=load_rule_file):
     """Applies a set of sound change files.
 
     Args:
@@ -369,32 +1015,107 @@ def apply_rule_files(word, pairs, debug=0, file_loader=workers.lf):
             0 (Default): Don't include anything
             1: Include the word at the end of each file
             2: Include the full debug output from apply_rule_list
+            3: Include the debug output from apply_rule_list, but only for
+                rules which changed the word
         file_loader: (Optional) A function that accepts filenames and returns
-            lists of sound changes. Defaults to loading the file from
-            wokers.FILE_PATH + '/files/'
+            lists of sound changes or CompiledRuleLists. Defaults to
+            load_rule_file.
 
     Returns:
         A tuple of the final result of the sound changes, and the debug info.
     """
-    db = []
-    # if any debug info is to be output, and there is at least one change to be
-    # applied, start by adding the initial language and word.
-    if pairs and debug:
-        db.append(pairs[0][0] + ': ' + word)
-    for cur in pair_iterator(pairs):
-        word, steps = apply_rule_list(word, file_loader(cur))
-        if debug > 1:
-            db.append(steps)
-        if debug:
-            db.append(cur + ': ' + word)
-    return word, '\n'.join(db)
+    stages = load_stages(pairs, file_loader)
+    return apply_stages(word, stages, pairs[0][0] if pairs else None, debug)
+
+
+def apply_rule_files_many(words, pairs, debug=0, file_loader=load_rule_file):
+    """Applies a set of sound change files to many words.
+
+    Each file is loaded and compiled once, when the first result is requested,
+    and the words are then processed one at a time, so words can be any
+    iterable, including one that is too large to fit in memory.
+
+    Args:
+        words: An iterable of words to apply the changes to.
+        pairs: The list of pairs, in the same format as apply_rule_files.
+        debug: (Optional) The level of debug info to be included in the
+            output, as in apply_rule_files.
+        file_loader: (Optional) A function that accepts filenames and returns
+            lists of sound changes or CompiledRuleLists. Defaults to
+            load_rule_file.
+
+    Yields:
+        For each word, a tuple of the final result of the sound changes, and
+        the debug info, exactly as returned by apply_rule_files.
+    """
+    stages = load_stages(pairs, file_loader)
+    start = pairs[0][0] if pairs else None
+    for word in words:
+        yield apply_stages(word, stages, start, debug)
+
+
+# The rule lists used by the current worker process in apply_parallel
+_worker_rules = None
+
+
+def _init_worker(rules):
+    """Stores the rule lists for a worker process of apply_parallel."""
+    global _worker_rules
+    _worker_rules = rules
+
+
+def _apply_chunk(words):
+    """Applies the worker's rule lists to a chunk of words."""
+    out = []
+    for word in words:
+        for rules in _worker_rules:
+            word = rules.apply(word)
+        out.append(word)
+    return out
+
+
+def apply_parallel(words, rules, workers, chunk_size=None):
+    """Applies a sequence of rule lists to many words using a process pool.
+
+    The rule lists are sent to each worker process once, when it starts, and
+    the words are sent in chunks.
+
+    Args:
+        words: A list of words to apply the changes to.
+        rules: A list of CompiledRuleLists, to be applied in order.
+        workers: The number of worker processes to use.
+        chunk_size: (Optional) The number of words to send to a worker at a
+            time. Defaults to splitting the words into four chunks per worker.
+
+    Returns:
+        A list of the results of the sound changes, in the same order as
+        words.
+    """
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(words) // (workers * 4)))
+    chunks = [words[i:i + chunk_size]
+              for i in range(0, len(words), chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(rules,)) as ex:
+        return [w for chunk in ex.map(_apply_chunk, chunks) for w in chunk]
 
 
 class SoundChangeCache(cache.ModifiedCache):
     """A sound change cache.
 
+    Besides the results of whole chains of sound change files, the result of
+    each step of a chain is cached, keyed on the word that step was applied
+    to, so chains which share a beginning, or steps, share work.
+
+    Attributes:
+        file_cache: The cache of compiled sound change files.
+        stage_cache: The cache of the results of single sound change files,
+            whose arguments are the word and the name of the file.
     """
-    def __init__(self, max_size=-1, file_cache_max_size=-1):
+    def __init__(self, max_size=-1, file_cache_max_size=-1,
+                 stage_cache_max_size=-1, max_bytes=-1,
+                 file_cache_max_bytes=-1, stage_cache_max_bytes=-1,
+                 shared_path=None, thread_safe=False):
         """Initializes the cache.
 
         Args:
@@ -403,12 +1124,57 @@ class SoundChangeCache(cache.ModifiedCache):
             file_cache_max_size: (Optional) The maximum number of entries in
                 the file cache. If set to -1 (default), the file cache has no
                 limit.
+            stage_cache_max_size: (Optional) The maximum number of entries in
+                the stage cache. If set to -1 (default), the stage cache has
+                no limit.
+            max_bytes: (Optional) The maximum estimated size of the cache, in
+                bytes. If set to -1 (default), the cache has no limit.
+            file_cache_max_bytes: (Optional) The maximum estimated size of the
+                file cache, in bytes. If set to -1 (default), the file cache
+                has no limit.
+            stage_cache_max_bytes: (Optional) The maximum estimated size of
+                the stage cache, in bytes. If set to -1 (default), the stage
+                cache has no limit.
+            shared_path: (Optional) The path to an SQLite database to share
+                results and stage results through, with every other
+                SoundChangeCache using the same path. If None (default),
+                results aren't shared.
+            thread_safe: (Optional) Whether the cache, the file cache, and the
+                stage cache can be used from several threads at once. If so,
+                concurrent calls for the same word and files wait for a single
+                computation. Defaults to False.
         """
-        self.file_cache = workers.FileCache(file_cache_max_size)
-        funct = lambda word, pairs: apply_rule_files(word, pairs, 0,
-                                                     self.file_cache)[0]
+        backend = stage_backend = None
+        if shared_path is not None:
+            backend = cache.SQLiteBackend(shared_path, 'results')
+            stage_backend = cache.SQLiteBackend(shared_path, 'stages')
+        self.file_cache = workers.FileCache(file_cache_max_size,
+                                            load_rule_file,
+                                            file_cache_max_bytes,
+                                            thread_safe)
+        self.stage_cache = cache.ModifiedCache(
+            lambda word, cur: self.file_cache(cur).apply(word),
+            lambda word, cur: cache.mtimes.getmtime(workers.path_to_file(cur)),
+            stage_cache_max_size, max_bytes=stage_cache_max_bytes,
+            backend=stage_backend, thread_safe=thread_safe)
         mod = lambda word, pairs: modified(pairs)
-        super().__init__(funct, mod, max_size)
+        super().__init__(self.apply_stages, mod, max_size,
+                         max_bytes=max_bytes, backend=backend,
+                         thread_safe=thread_safe)
+
+    def apply_stages(self, word, pairs):
+        """Applies a set of sound change files, using the stage cache.
+
+        Args:
+            word: The word to apply the changes to.
+            pairs: The list of pairs, in the same format as apply_rule_files.
+
+        Returns:
+            The final result of the sound changes.
+        """
+        for cur in pair_iterator(pairs):
+            word = self.stage_cache(word, cur)
+        return word
 
 
 def modified(pairs):
@@ -419,12 +1185,13 @@ def modified(pairs):
             apply_sound_change_files.
 
     Returns:
-        The latest modification time from any file in the chain.
+        The latest modification time from any file in the chain, or 0 if there
+        are no files.
     """
     # gets the modification time from a file
-    key = lambda cur: path.getmtime(workers.path_to_file(cur))
+    key = lambda cur: cache.mtimes.getmtime(workers.path_to_file(cur))
     # get max modification time from all the files
-    return max(map(key, pair_iterator(pairs)))
+    return max(map(key, pair_iterator(pairs)), default=0)
 
 
 def pair_iterator(pairs):
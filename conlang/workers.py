@@ -27,15 +27,24 @@ class FileCache(cache.ModifiedCache):
     """A cache for files.
 
     """
-    def __init__(self, max_size=-1):
+    def __init__(self, max_size=-1, loader=None, max_bytes=-1,
+                 thread_safe=False):
         """Initializes the cache.
 
         Args:
             max_size: (Optional) The maximum number of entries in the cache. If
                 set to -1 (default), the cache has no limit.
+            loader: (Optional) The function used to load a file, given its
+                name. Defaults to lf.
+            max_bytes: (Optional) The maximum estimated size of the cache, in
+                bytes. If set to -1 (default), the cache has no limit.
+            thread_safe: (Optional) Whether the cache can be used from several
+                threads at once. Defaults to False.
         """
-        super().__init__(lf, lambda f: path.getmtime(path_to_file(f)),
-                         max_size)
+        super().__init__(loader or lf,
+                         lambda f: cache.mtimes.getmtime(path_to_file(f)),
+                         max_size, max_bytes=max_bytes,
+                         thread_safe=thread_safe)
 
 
 def flip_dict(d):
@@ -62,7 +71,20 @@ def load_text_file(filename):
         starting with '//'.
     """
     with open(path.expanduser(filename), encoding='utf-8') as f:
-        return [l.strip('\n') for l in f if l.strip() and not l.startswith('//')]
+        return text_lines(f)
+
+
+def text_lines(f):
+    """Returns the lines of a text file, as load_text_file does.
+
+    Args:
+        f: The file, or any iterable of lines.
+
+    Returns:
+        A list of the lines, leaving out blank lines, and lines starting with
+        '//'.
+    """
+    return [l.strip('\n') for l in f if l.strip() and not l.startswith('//')]
 
 
 def lf(filename):
@@ -75,6 +97,24 @@ def path_to_file(filename):
     return path.join(FILE_PATH, 'files', filename)
 
 
+def watch_files():
+    """Watches FILE_PATH + '/files/' for changes, if possible.
+
+    While it is being watched, the modification times of the files in it are
+    only checked again when they change. This requires the inotify_simple
+    module.
+
+    Returns:
+        True if the directory is being watched, False otherwise.
+    """
+    return cache.mtimes.watch(path.join(FILE_PATH, 'files'))
+
+
+def path_to_cache(filename):
+    """Returns a file path prefixed with FILE_PATH + '/cache/'."""
+    return path.join(FILE_PATH, 'cache', filename)
+
+
 class Reencoder():
     """A stream that uses 'xmlcharrefreplace' to reencode it's output.
 
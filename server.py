@@ -0,0 +1,203 @@
+#!./.interpreter.sh
+
+import argparse
+import os
+import signal
+import socketserver
+import time
+import traceback
+import urllib.parse
+import wsgiref.simple_server
+from os import path
+from soundchanger import cgi_app
+from soundchanger.conlang import sound_changer, workers
+
+# Results of sound changes without debug info, which also holds the cache of
+# compiled rule files. Both are kept for the life of the process. It is
+# replaced by serve if the results are to be shared between processes. It is
+# thread safe, so that it can be used by a threaded server.
+result_cache = sound_changer.SoundChangeCache(thread_safe=True)
+
+# The number of seconds to wait before replacing a worker process which exited
+RESTART_DELAY = 1
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn,
+                          wsgiref.simple_server.WSGIServer):
+    """A WSGI server which handles each request in a new thread."""
+    daemon_threads = True
+
+
+def app(environ, start_response):
+    """A WSGI app serving the same requests as cgi_app.
+
+    Accepts the form parameters 'word', 'start-N', 'end-N' and 'debug', either
+    in the query string or in a urlencoded POST body.
+
+    Args:
+        environ: The WSGI environment.
+        start_response: The WSGI start_response callable.
+
+    Returns:
+        A list containing the HTML output as bytes.
+    """
+    query = environ.get('QUERY_STRING', '')
+    if environ.get('REQUEST_METHOD') == 'POST':
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        query += '&' + environ['wsgi.input'].read(length).decode('utf-8')
+    form = {k: v[-1] for k, v in
+            urllib.parse.parse_qs(query, keep_blank_values=True).items()}
+    try:
+        word, pairs, debug = cgi_app.parse_form(form)
+    except (KeyError, ValueError):
+        start_response('400 Bad Request', [('Content-Type', 'text/plain')])
+        return [b'Bad Request\n']
+    if debug:
+        word, db = sound_changer.apply_rule_files(word, pairs, debug,
+                                                  result_cache.file_cache)
+    else:
+        pairs = tuple(tuple(p) for p in pairs)
+        word, db = result_cache(word, pairs), ''
+    # encode all non-ascii characters with xml escapes, as cgi_app does
+    body = workers.reencode(cgi_app.render(word, db, True)).encode('ascii')
+    start_response('200 OK', [('Content-Type', 'text/html'),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+
+def preload():
+    """Loads and compiles every sound change file into the cache."""
+    files_path = workers.path_to_file('')
+    for f in sorted(os.listdir(files_path)):
+        if not f.startswith('.') and path.isfile(path.join(files_path, f)):
+            result_cache.file_cache(f)
+
+
+def serve(host='', port=8000, processes=1, shared_path=None, threads=False):
+    """Serves app until interrupted.
+
+    The sound change files are loaded before any worker processes are forked,
+    so every worker starts with a warm cache. With more than one process, the
+    original process only supervises the workers, as in supervise.
+
+    Args:
+        host: (Optional) The address to listen on. Defaults to all addresses.
+        port: (Optional) The port to listen on. Defaults to 8000.
+        processes: (Optional) The number of processes to serve requests from,
+            sharing the listening socket. Defaults to 1.
+        shared_path: (Optional) The path to an SQLite database used to share
+            results between processes, including other servers and
+            SoundChangeCaches. If None (default), results aren't shared.
+        threads: (Optional) Whether each process serves requests
+            concurrently, in a thread per request. Concurrent requests for the
+            same word share a single computation. Defaults to False.
+    """
+    global result_cache
+    if shared_path is not None:
+        result_cache = sound_changer.SoundChangeCache(shared_path=shared_path,
+                                                      thread_safe=True)
+    preload()
+    if threads:
+        server_class = ThreadingWSGIServer
+    else:
+        server_class = wsgiref.simple_server.WSGIServer
+    server = wsgiref.simple_server.make_server(host, port, app, server_class)
+    try:
+        if processes > 1:
+            supervise(server, processes)
+        else:
+            run(server)
+    finally:
+        server.server_close()
+
+
+def run(server):
+    """Serves requests in the current process until interrupted.
+
+    Args:
+        server: The WSGI server.
+    """
+    # each process needs its own watcher, since threads don't survive a fork
+    workers.watch_files()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def supervise(server, processes):
+    """Serves requests from worker processes until interrupted.
+
+    Workers which exit are replaced, after RESTART_DELAY seconds. When the
+    supervising process gets SIGTERM or SIGINT, it terminates the workers,
+    and waits for them to exit.
+
+    Args:
+        server: The WSGI server, whose socket the workers share.
+        processes: The number of worker processes.
+    """
+    children = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                # it has already exited, and will be reaped
+                pass
+
+    stop_signals = {signal.SIGTERM, signal.SIGINT}
+    handlers = {s: signal.signal(s, stop) for s in stop_signals}
+    try:
+        while True:
+            while not stopping and len(children) < processes:
+                # the signals are blocked until the child is in children, so
+                # that stop always sees it
+                signal.pthread_sigmask(signal.SIG_BLOCK, stop_signals)
+                pid = os.fork()
+                if pid == 0:
+                    for s, handler in handlers.items():
+                        signal.signal(s, handler)
+                    signal.pthread_sigmask(signal.SIG_UNBLOCK, stop_signals)
+                    try:
+                        run(server)
+                    except BaseException:
+                        traceback.print_exc()
+                        os._exit(1)
+                    os._exit(0)
+                children.add(pid)
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, stop_signals)
+            if not children:
+                return
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                return
+            children.discard(pid)
+            if not stopping:
+                # don't restart a worker which keeps failing too quickly
+                time.sleep(RESTART_DELAY)
+    finally:
+        for s, handler in handlers.items():
+            signal.signal(s, handler)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='')
+    parser.add_argument('--port', '-p', type=int, default=8000)
+    parser.add_argument('--processes', '-n', type=int, default=1)
+    parser.add_argument('--shared-cache', '-c')
+    parser.add_argument('--threads', '-t', action='store_true')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.processes, args.shared_cache,
+          args.threads)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+import concurrent.futures
+import os
+import tempfile
+import threading
+import time
+import unittest
+from soundchanger.conlang import cache
+
+
+class Counter(object):
+    """A function which counts its calls."""
+
+    def __init__(self, funct=lambda x: x * 2):
+        self.funct = funct
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        return self.funct(*args)
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_cached(self):
+        f = Counter()
+        c = cache.Cache(f)
+        self.assertEqual(c(1), 2)
+        self.assertEqual(c(1), 2)
+        self.assertEqual(f.calls, [(1,)])
+
+    def test_lru_eviction(self):
+        f = Counter()
+        c = cache.Cache(f, max_size=2)
+        c(1)
+        c(2)
+        # 1 is now more recently used than 2
+        c(1)
+        c(3)
+        self.assertEqual(c.mod_times, [(1,), (3,)])
+        c(2)
+        self.assertEqual(f.calls, [(1,), (2,), (3,), (2,)])
+
+    def test_purge(self):
+        c = cache.Cache(Counter())
+        for i in range(5):
+            c(i)
+        c.purge(2)
+        self.assertEqual(c.mod_times, [(2,), (3,), (4,)])
+        c.purge()
+        self.assertEqual(c.mod_times, [])
+
+    def test_update(self):
+        f = Counter()
+        c = cache.Cache(f)
+        c(1)
+        self.assertEqual(c.update(1), 2)
+        self.assertEqual(len(f.calls), 2)
+
+
+class SizeTest(unittest.TestCase):
+
+    def test_estimate_size(self):
+        self.assertGreater(cache.estimate_size(['a' * 100]),
+                           cache.estimate_size(['a']))
+        self.assertGreater(cache.estimate_size({'a': 'b' * 100}), 100)
+
+    def test_max_bytes(self):
+        c = cache.Cache(Counter(), max_bytes=30, sizeof=lambda x: 5)
+        for i in range(5):
+            c(i)
+        # each entry is 10 bytes: 5 for the key and 5 for the value
+        self.assertEqual(c.mod_times, [(2,), (3,), (4,)])
+        self.assertEqual(c.nbytes, 30)
+        self.assertEqual(c.evictions, 2)
+
+    def test_nbytes(self):
+        c = cache.Cache(Counter(), sizeof=lambda x: 1)
+        c(1)
+        c.update(1)
+        self.assertEqual(c.nbytes, 2)
+        c.purge()
+        self.assertEqual(c.nbytes, 0)
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_stats(self):
+        c = cache.Cache(Counter(), max_size=1, sizeof=lambda x: 1)
+        c(1)
+        c(1)
+        c(2)
+        stats = c.stats()
+        self.assertEqual(
+            {k: v for k, v in stats.items() if k != 'compute_time'},
+            {'hits': 1, 'misses': 2, 'stale': 0, 'evictions': 1, 'size': 1,
+             'nbytes': 2})
+        self.assertGreaterEqual(stats['compute_time'], 0)
+
+    def test_stale(self):
+        version = [0]
+        c = cache.ModifiedCache(Counter(), lambda x: version[0])
+        c(1)
+        version[0] = 1
+        c(1)
+        self.assertEqual(c.stats()['stale'], 1)
+
+    def test_reset_stats(self):
+        c = cache.Cache(Counter())
+        c(1)
+        c(1)
+        c.reset_stats()
+        self.assertEqual(c.stats()['hits'], 0)
+        self.assertEqual(c.stats()['misses'], 0)
+        self.assertEqual(c.stats()['size'], 1)
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def blocking(self, funct):
+        """Wraps funct so it waits for self.release before returning."""
+        def wrapped(*args):
+            self.entered.set()
+            self.release.wait(5)
+            return funct(*args)
+        return wrapped
+
+    def call_concurrently(self, c, n=4):
+        with concurrent.futures.ThreadPoolExecutor(n) as pool:
+            first = pool.submit(c, 1)
+            self.assertTrue(self.entered.wait(5))
+            rest = [pool.submit(c, 1) for _ in range(n - 1)]
+            # give the other threads time to start waiting
+            time.sleep(0.1)
+            self.release.set()
+            return [first] + rest
+
+    def test_computed_once(self):
+        f = Counter(self.blocking(lambda x: x * 2))
+        c = cache.Cache(f, thread_safe=True)
+        futures = self.call_concurrently(c)
+        self.assertEqual([fut.result() for fut in futures], [2] * 4)
+        self.assertEqual(f.calls, [(1,)])
+        self.assertEqual(c._pending, {})
+
+    def test_exception(self):
+        def fail(x):
+            raise ValueError(x)
+        c = cache.Cache(self.blocking(fail), thread_safe=True)
+        for fut in self.call_concurrently(c):
+            self.assertRaises(ValueError, fut.result)
+        self.assertEqual(c._pending, {})
+        self.assertEqual(c.mod_times, [])
+
+    def test_different_keys(self):
+        f = Counter()
+        c = cache.Cache(f, thread_safe=True)
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            self.assertEqual(list(pool.map(c, range(8))),
+                             [2 * i for i in range(8)])
+        self.assertEqual(sorted(f.calls), [(i,) for i in range(8)])
+
+
+class MTimeSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.filename)
+        os.utime(self.filename, (100, 100))
+
+    def test_interval(self):
+        snapshot = cache.MTimeSnapshot(interval=60)
+        self.assertEqual(snapshot.getmtime(self.filename), 100)
+        os.utime(self.filename, (200, 200))
+        self.assertEqual(snapshot.getmtime(self.filename), 100)
+        snapshot.invalidate(self.filename)
+        self.assertEqual(snapshot.getmtime(self.filename), 200)
+
+    def test_no_interval(self):
+        snapshot = cache.MTimeSnapshot(interval=0)
+        self.assertEqual(snapshot.getmtime(self.filename), 100)
+        os.utime(self.filename, (200, 200))
+        self.assertEqual(snapshot.getmtime(self.filename), 200)
+
+
+class ModifiedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.version = 0
+        self.f = Counter()
+
+    def modified(self, *args):
+        return self.version
+
+    def test_modified(self):
+        c = cache.ModifiedCache(self.f, self.modified)
+        c(1)
+        c(1)
+        self.version = 1
+        c(1)
+        # versions are compared for equality, so going back also counts
+        self.version = 0
+        c(1)
+        self.assertEqual(len(self.f.calls), 3)
+
+    def test_interval(self):
+        c = cache.ModifiedCache(self.f, self.modified, interval=60)
+        c(1)
+        self.version = 1
+        c(1)
+        self.assertEqual(len(self.f.calls), 1)
+
+    def test_modified_while_computing(self):
+        def funct(x):
+            # a change made after the version was taken
+            self.version = 1
+            return x
+        f = Counter(funct)
+        c = cache.ModifiedCache(f, self.modified)
+        c(1)
+        c(1)
+        self.assertEqual(len(f.calls), 2)
+        c(1)
+        self.assertEqual(len(f.calls), 2)
+
+
+class SQLiteBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.filename = os.path.join(tmp.name, 'cache.sqlite')
+
+    def test_get_set(self):
+        backend = cache.SQLiteBackend(self.filename)
+        self.assertIsNone(backend.get(('a', 1)))
+        backend.set(('a', 1), 10, ['x'])
+        backend.set(('a', 1), 20, ['y'])
+        self.assertEqual(backend.get(('a', 1)), (20, ['y']))
+        backend.clear()
+        self.assertIsNone(backend.get(('a', 1)))
+
+    def test_tables(self):
+        first = cache.SQLiteBackend(self.filename, 'first')
+        second = cache.SQLiteBackend(self.filename, 'second')
+        first.set('a', 0, 1)
+        self.assertIsNone(second.get('a'))
+        # another connection to the same file sees the entry
+        self.assertEqual(cache.SQLiteBackend(self.filename, 'first').get('a'),
+                         (0, 1))
+
+    def test_shared(self):
+        version = [0]
+        modified = lambda x: version[0]
+        f, g = Counter(), Counter()
+        first = cache.ModifiedCache(
+            f, modified, backend=cache.SQLiteBackend(self.filename))
+        second = cache.ModifiedCache(
+            g, modified, backend=cache.SQLiteBackend(self.filename))
+        self.assertEqual(first(1), 2)
+        self.assertEqual(second(1), 2)
+        self.assertEqual(g.calls, [])
+        # a value computed with an out of date version isn't used
+        version[0] = 1
+        self.assertEqual(second(1), 2)
+        self.assertEqual(g.calls, [(1,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+from soundchanger import cgi_app
+
+
+class CgiAppTest(unittest.TestCase):
+
+    def test_parse_form(self):
+        form = {'word': 'apa', 'start-1': 'x', 'end-1': 'x.y',
+                'start-0': ' ', 'end-0': 'a.b', 'debug': '2'}
+        self.assertEqual(cgi_app.parse_form(form),
+                         ('apa', [('', 'a.b'), ('x', 'x.y')], 2))
+
+    def test_format_stats(self):
+        self.assertEqual(
+            cgi_app.format_stats('files', {'hits': 3, 'compute_time': 0.5}),
+            'files: hits=3 compute_time=0.5')
+
+
+if __name__ == '__main__':
+    unittest.main()
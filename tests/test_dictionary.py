@@ -0,0 +1,253 @@
+import os
+import random
+import regex
+import tempfile
+import unittest
+from unittest import mock
+from soundchanger.conlang import dictionary, sound_changer
+
+
+def words(view):
+    return [e['word'] for e in view]
+
+
+class CollatorTest(unittest.TestCase):
+
+    def test_sort_key(self):
+        key = dictionary.sort_key({'a': 0, 'ch': 1, 'c': 2, '\u0301': None})
+        self.assertEqual(key('cha'), [1, 0])
+        self.assertEqual(key('ca\u0301x'), [2, 0, -1])
+
+    def test_ordering(self):
+        self.assertEqual(dictionary.sort_key('ba')('abc'), [1, 0, -1])
+
+    def test_empty(self):
+        for alpha in [{}, '', 5]:
+            with self.subTest(alpha=alpha):
+                self.assertEqual(dictionary.sort_key(alpha)('ab'), [-1, -1])
+
+    def test_same_collator(self):
+        self.assertIs(dictionary.sort_key({'a': 0}),
+                      dictionary.sort_key({'a': 0}))
+
+
+class SortedTest(unittest.TestCase):
+
+    classes = [dictionary.Dictionary, dictionary.ColumnarDictionary]
+
+    def test_sorted(self):
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = cls([{'word': 'ba'}, {'word': 'ab'}, {'word': 'b'}])
+                self.assertEqual(words(d.sorted()), ['ab', 'b', 'ba'])
+                self.assertEqual(words(d.sorted('word', 'ba')),
+                                 ['b', 'ba', 'ab'])
+                self.assertEqual(words(d.sorted('word', {})),
+                                 ['b', 'ba', 'ab'])
+
+    def test_changed_field(self):
+        # cached sort keys aren't used once the field changes
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = cls([{'word': 'ba'}, {'word': 'ab'}])
+                self.assertEqual(words(d.sorted('word', 'ab')), ['ab', 'ba'])
+                d[0]['word'] = 'aa'
+                self.assertEqual(words(d.sorted('word', 'ab')), ['aa', 'ab'])
+
+
+class DictionaryViewTest(unittest.TestCase):
+
+    classes = [dictionary.Dictionary, dictionary.ColumnarDictionary]
+
+    def make(self, cls, n=6):
+        return cls([{'word': 'w{}'.format(i)} for i in range(n)])
+
+    def test_contains(self):
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = self.make(cls)
+                view = d[1:4]
+                self.assertIn(d[2], view)
+                self.assertNotIn(d[0], view)
+                # other objects are compared by equality
+                self.assertIn({'word': 'w3'}, view)
+                self.assertNotIn({'word': 'w0'}, view)
+
+    def test_set_operations(self):
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = self.make(cls)
+                a, b = d[0:4], d[2:6]
+                self.assertEqual(words(a & b), ['w2', 'w3'])
+                self.assertEqual(words(a | b),
+                                 ['w' + str(i) for i in range(6)])
+                self.assertEqual(words(a - b), ['w0', 'w1'])
+                self.assertEqual(words(a ^ b), ['w0', 'w1', 'w4', 'w5'])
+                # views of views are combined through the Dictionary
+                self.assertEqual(words(a[1:] & b[:1]), ['w2'])
+
+    def test_append_after_view(self):
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = self.make(cls)
+                view = d[0:3]
+                self.assertIn(d[0], view)
+                d.append({'word': 'new'})
+                self.assertNotIn(d[6], view)
+                self.assertIn(d[1], view)
+                self.assertEqual(words(view | d[6:]),
+                                 ['w0', 'w1', 'w2', 'new'])
+
+    def test_delete_after_view(self):
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = self.make(cls)
+                a, b = d[3:6], d[0:2]
+                self.assertEqual(len(a | b), 5)
+                del d[0]
+                # the views keep their indices, and those past the end of the
+                # Dictionary are left out
+                self.assertEqual(words(a | b), ['w1', 'w2', 'w4', 'w5'])
+                self.assertEqual(words(a & d[4:]), ['w5'])
+                self.assertIn(d[3], a)
+                self.assertNotIn(d[0], a)
+
+    def test_same_entry_twice(self):
+        d = self.make(dictionary.Dictionary, 3)
+        d[1] = d[0]
+        d[0] = {'word': 'x'}
+        d[1] = {'word': 'y'}
+        self.assertEqual(words(d), ['x', 'y', 'w2'])
+        e = d[2]
+        d[0] = e
+        self.assertIn(e, d[0:1])
+        self.assertIn(e, d[2:3])
+        self.assertNotIn(e, d[1:2])
+
+
+class NGramIndexTest(unittest.TestCase):
+
+    classes = [dictionary.Dictionary, dictionary.ColumnarDictionary]
+
+    def setUp(self):
+        # use the index however small the Dictionary is
+        patch = mock.patch.object(dictionary, 'INDEX_MIN_SIZE', 0)
+        patch.start()
+        self.addCleanup(patch.stop)
+        rand = random.Random(0)
+        self.words = [''.join(rand.choice('aptk]^')
+                              for _ in range(rand.randrange(8)))
+                      for _ in range(200)]
+
+    def make(self, cls):
+        return cls([{'word': w} for w in self.words] + [{'gloss': 'x'}])
+
+    def test_lookup(self):
+        ind = dictionary.NGramIndex('word', [{'word': 'apa'}, {'word': 'pat'},
+                                             {'gloss': 'apa'}])
+        self.assertEqual(ind.lookup('pa'), {0, 1})
+        self.assertEqual(ind.lookup('apa'), {0})
+        # every n-gram has to be in the same Entry
+        self.assertEqual(ind.lookup('apat'), set())
+        self.assertIsNone(ind.lookup('a'))
+        self.assertEqual(ind.lookup('kk'), set())
+
+    def test_candidates(self):
+        ind = dictionary.NGramIndex('word', [{'word': 'apa'}, {'word': 'pat'},
+                                             {'word': 'tak'}])
+        self.assertEqual(ind.candidates([('ap', 'ak')]), {0, 2})
+        self.assertEqual(ind.candidates([('pa',), ('at',)]), {1})
+        # a requirement with an alternative too short to look up is ignored
+        self.assertIsNone(ind.candidates([('ap', 'k')]))
+
+    def test_same_as_brute_force(self):
+        for cls in self.classes:
+            d = self.make(cls)
+            for s in ['pa', 'apt', 'a[pt]a', 'k[^]]a', 'ta|at', '(pa)+k',
+                      'a]', r'\^a', 'p.?a', '^ka', 'k(?=a)', '(?i)PA']:
+                with self.subTest(cls=cls.__name__, search=s):
+                    self.assertEqual(
+                        words(d.search(s)),
+                        [w for w in self.words if regex.search(s, w)])
+
+    def test_updated(self):
+        for cls in self.classes:
+            with self.subTest(cls=cls.__name__):
+                d = self.make(cls)
+                d.search('apt')
+                d.append({'word': 'kapt'})
+                d[0] = {'word': 'aptk'}
+                expected = ['aptk'] + [w for w in self.words[1:] + ['kapt']
+                                       if 'apt' in w]
+                self.assertEqual(words(d.search('apt')), expected)
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.d = dictionary.Dictionary(
+            [{'word': w, 'gloss': g} for w, g in
+             [('apa', 'father'), ('tapa', 'cloth'), ('pita', 'bread'),
+              ('ata', 'apa')]] + [{'gloss': 'none'}])
+        self.cats = {'V': sound_changer.Category(['a', 'i'])}
+
+    def test_regex(self):
+        self.assertEqual(words(self.d.search('a.a')),
+                         ['apa', 'tapa', 'ata'])
+        self.assertEqual(words(self.d.search(regex.compile('^a'))),
+                         ['apa', 'ata'])
+
+    def test_rule_syntax(self):
+        self.assertEqual(words(self.d.search('{V}p{V}', cats=self.cats)),
+                         ['apa', 'tapa'])
+        self.assertEqual(words(self.d.search('t{V}', cats=self.cats)),
+                         ['tapa', 'pita', 'ata'])
+
+    def test_compiled_once(self):
+        query = dictionary.Search('{V}p{V}', self.cats)
+        self.assertEqual(words(self.d.search(query)), ['apa', 'tapa'])
+        self.assertEqual(query.spans('tapa'), [(1, 4)])
+
+    def test_fields(self):
+        self.assertEqual(words(self.d.search('^apa', ['word', 'gloss'])),
+                         ['apa', 'ata'])
+
+    def test_spans(self):
+        view = self.d.search('a', ['word', 'gloss'], spans=True)
+        self.assertEqual(view.spans[0], {'word': [(0, 1), (2, 3)],
+                                         'gloss': [(1, 2)]})
+        self.assertEqual(view.spans[2], {'word': [(3, 4)], 'gloss': [(3, 4)]})
+        self.assertEqual(len(view.spans), len(view))
+
+
+class JSONLTest(unittest.TestCase):
+
+    classes = [dictionary.Dictionary, dictionary.ColumnarDictionary]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.filename = os.path.join(tmp.name, 'dict.jsonl')
+
+    def test_round_trip(self):
+        entries = [{'word': 'apa', 'gloss': 'father'}, {'word': 'ta'},
+                   {'gloss': 'none'}]
+        for cls in self.classes:
+            for load_cls in self.classes:
+                with self.subTest(cls=cls.__name__, load=load_cls.__name__):
+                    d = cls(entries, {'a': 0, 'p': 1})
+                    d.to_JSONL(self.filename, override=True)
+                    loaded = load_cls.from_JSONL(self.filename)
+                    self.assertIsInstance(loaded, load_cls)
+                    self.assertEqual([dict(e) for e in loaded], entries)
+                    self.assertEqual(loaded.alpha, d.alpha)
+
+    def test_reader(self):
+        dictionary.Dictionary([{'word': 'apa'}]).to_JSONL(self.filename,
+                                                          override=True)
+        with dictionary.JSONLReader(self.filename) as reader:
+            self.assertEqual([dict(e) for e in reader], [{'word': 'apa'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
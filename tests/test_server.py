@@ -0,0 +1,152 @@
+import io
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.request
+from unittest import mock
+from soundchanger import server
+from soundchanger.conlang import cache, sound_changer, workers
+
+
+def make_files(directory, files):
+    """Writes sound change files into directory + '/files/'."""
+    os.makedirs(os.path.join(directory, 'files'), exist_ok=True)
+    for name, lines in files.items():
+        with open(os.path.join(directory, 'files', name), 'w',
+                  encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+class AppTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        make_files(tmp.name, {'a.b': ['p > b']})
+        patches = [mock.patch.object(workers, 'FILE_PATH', tmp.name),
+                   mock.patch.object(server, 'result_cache',
+                                     sound_changer.SoundChangeCache())]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        cache.mtimes.invalidate()
+
+    def request(self, query):
+        status = []
+        environ = {'QUERY_STRING': query, 'REQUEST_METHOD': 'GET',
+                   'wsgi.input': io.BytesIO()}
+        body = b''.join(server.app(environ,
+                                   lambda s, headers: status.append(s)))
+        return status[0], body.decode('ascii')
+
+    def test_word(self):
+        status, body = self.request('word=apa&start-0=a&end-0=a.b')
+        self.assertEqual(status, '200 OK')
+        self.assertIn('aba', body)
+
+    def test_repeated_without_pairs(self):
+        # the second request checks the cached result
+        for _ in range(2):
+            status, body = self.request('word=apa')
+            self.assertEqual(status, '200 OK')
+            self.assertIn('apa', body)
+
+    def test_debug(self):
+        status, body = self.request('word=apa&start-0=a&end-0=a.b&debug=1')
+        self.assertEqual(status, '200 OK')
+        self.assertIn('a.b: aba', body)
+
+    def test_bad_request(self):
+        status, body = self.request('debug=x')
+        self.assertEqual(status, '400 Bad Request')
+
+
+SERVE = '''
+import sys
+from soundchanger import server
+from soundchanger.conlang import workers
+workers.FILE_PATH = sys.argv[1]
+server.RESTART_DELAY = 0.1
+server.serve('127.0.0.1', int(sys.argv[2]), 2)
+'''
+
+
+@unittest.skipUnless(hasattr(os, 'fork') and os.path.exists('/proc/self/task'),
+                     'needs fork and /proc')
+class SuperviseTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        make_files(tmp.name, {'a.b': ['p > b']})
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self.proc = subprocess.Popen(
+            [sys.executable, '-c', SERVE, tmp.name, str(self.port)],
+            env=env, stderr=subprocess.DEVNULL)
+        self.addCleanup(self.kill_all)
+        self.wait_for(lambda: len(self.children()) == 2)
+        self.wait_for(self.serving)
+
+    def kill_all(self):
+        for pid in self.children():
+            os.kill(pid, signal.SIGKILL)
+        self.proc.kill()
+        self.proc.wait()
+
+    def children(self):
+        try:
+            path = '/proc/{0}/task/{0}/children'.format(self.proc.pid)
+            with open(path) as f:
+                return [int(pid) for pid in f.read().split()]
+        except FileNotFoundError:
+            return []
+
+    def serving(self):
+        url = 'http://127.0.0.1:{}/?word=apa&start-0=a&end-0=a.b'.format(
+            self.port)
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return b'aba' in response.read()
+        except OSError:
+            return False
+
+    def wait_for(self, condition, timeout=10):
+        end = time.time() + timeout
+        while not condition():
+            if time.time() > end:
+                self.fail('timed out')
+            time.sleep(0.05)
+
+    def test_restart(self):
+        old = self.children()
+        os.kill(old[0], signal.SIGKILL)
+        self.wait_for(lambda: (len(self.children()) == 2 and
+                               old[0] not in self.children()))
+        self.assertTrue(self.serving())
+
+    def assert_stops(self, signum):
+        children = self.children()
+        self.proc.send_signal(signum)
+        self.assertEqual(self.proc.wait(10), 0)
+        for pid in children:
+            with self.assertRaises(ProcessLookupError):
+                os.kill(pid, 0)
+        self.assertFalse(self.serving())
+
+    def test_terminate(self):
+        self.assert_stops(signal.SIGTERM)
+
+    def test_interrupt(self):
+        self.assert_stops(signal.SIGINT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+import os
+import pickle
+import random
+import regex
+import tempfile
+import unittest
+from unittest import mock
+from soundchanger.conlang import cache, sound_changer, workers
+
+
+RULES = [
+    'V = a e i',
+    'U = o o u',
+    'p > b / {V}_{V}',
+    '{1:V} > {1:U} / _#',
+    'k > g | t > d',
+    'x > 0',
+]
+
+
+class CompiledRuleListTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = sound_changer.CompiledRuleList(RULES)
+
+    def test_apply(self):
+        for word, out in [('apa', 'abo'), ('pipi', 'pibu'), ('kat', 'gat'),
+                          ('tak', 'tag'), ('xax', 'a'), ('', '')]:
+            with self.subTest(word=word):
+                self.assertEqual(self.rules.apply(word), out)
+
+    def test_same_as_apply_rule_list(self):
+        for word in ['apa', 'pipi', 'kat', 'tak', 'xax', 'mupe']:
+            with self.subTest(word=word):
+                self.assertEqual(
+                    sound_changer.apply_rule_list(word, self.rules),
+                    sound_changer.apply_rule_list(word, RULES))
+
+    def test_categories_in_effect(self):
+        # a rule only sees the categories defined before it
+        rules = sound_changer.CompiledRuleList(
+            ['C = p', '{C} > b', 'C = t', '{C} > d'])
+        self.assertEqual(rules.apply('pt'), 'bd')
+
+    def test_compile_rule_list(self):
+        self.assertIs(sound_changer.compile_rule_list(self.rules), self.rules)
+
+    def test_pickle(self):
+        rules = pickle.loads(pickle.dumps(self.rules))
+        self.assertEqual(rules.apply('apape'), 'ababo')
+        self.assertEqual(rules.lines, RULES)
+
+
+class TriePatternTest(unittest.TestCase):
+
+    def test_literals(self):
+        self.assertEqual(sound_changer.trie_pattern(['p', 't', 'ts', 'tʃ']),
+                         '(?:t[sʃ]?|p)')
+        self.assertEqual(sound_changer.trie_pattern([]), '')
+
+    def test_longest_first(self):
+        # each item is tried before its prefixes, wherever it is in the
+        # category, so the results are the same as for a flat alternation,
+        # longest first
+        rng = random.Random(0)
+        items = ['t', 'ts', 'tsʰ', 'tʃ', 'p', 'ph', 'k', 'kʷ', 'a', 'aː']
+        for _ in range(200):
+            cat = rng.sample(items, rng.randint(1, len(items)))
+            flat = '|'.join(sorted(cat, key=len, reverse=True))
+            trie = sound_changer.trie_pattern(cat)
+            word = ''.join(rng.choice(items) for _ in range(6))
+            with self.subTest(cat=cat, word=word):
+                self.assertEqual(regex.findall(trie, word),
+                                 regex.findall(flat, word))
+
+    def test_patterns(self):
+        # a pattern item longer than a literal one is tried first
+        rules = sound_changer.CompiledRuleList(['X = a [ae]b', '{1:X} > Q'])
+        self.assertEqual(rules.apply('abeb'), 'QQ')
+
+
+class PrefilterTest(unittest.TestCase):
+
+    def compile(self, line, cats=None):
+        return sound_changer.CompiledRule(
+            sound_changer.parse_rule(line, cats or {}), cats or {})
+
+    def test_requirements(self):
+        for pattern, requirements in [
+                ('abc', [('abc',)]),
+                ('ab?c', [('a',), ('c',)]),
+                ('a+b', [('a',), ('b',)]),
+                ('a[bc]d', [('a',), ('d',)]),
+                ('[^]]x', [('x',)]),
+                ('[]a]x', [('x',)]),
+                ('a|b', []),
+                ('[[:alpha:]]', [])]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(
+                    sound_changer.required_literals(pattern, {}),
+                    requirements)
+
+    def test_negated_class(self):
+        rule = self.compile('[^]]x > y')
+        self.assertTrue(rule.can_match('ax', set('ax')))
+        self.assertEqual(rule.apply('ax'), 'y')
+
+    def test_word_boundaries(self):
+        # the lookarounds '#' expands to don't turn the prefilter off
+        for line in ['pa > ba / #_', 'pa > ba / _#', 'pa > ba ! #_']:
+            with self.subTest(line=line):
+                rule = self.compile(line)
+                self.assertEqual(rule.requirements, [('pa',)])
+                self.assertFalse(rule.can_match('tata'))
+
+    def test_inline_flags(self):
+        rule = self.compile('pa > ba / (?i)x_')
+        self.assertEqual(rule.requirements, [])
+
+    def test_no_false_negatives(self):
+        # the prefilter must never rule out a word the pattern matches
+        rng = random.Random(0)
+        atoms = ['a', 'b', 'c', ']', '^', '$', '.', '[^]]', '[]a]', '[^a]',
+                 '[ab]', '[a-c]', '[[:alpha:]]', '(ab)', '(a|b)', '{V}',
+                 '{1:V}', '{W}']
+        quantifiers = ['', '', '', '?', '*', '+', '{2}', '{0,2}', '??',
+                       '*?']
+        contexts = ['', 'a', '[^]]', '(?i)a', '{V}', '(?<=^|\\s)']
+        cats = {'V': sound_changer.Category(['a', 'e']),
+                'W': sound_changer.Category(['a', '[bc]'])}
+        for _ in range(2000):
+            rule = {'from': ''.join(rng.choice(atoms) + rng.choice(quantifiers)
+                                    for _ in range(rng.randint(1, 4))),
+                    'to': 'Q',
+                    rng.choice(['before', 'after']): rng.choice(contexts)}
+            try:
+                compiled = sound_changer.CompiledRule(rule, cats)
+            except regex.error:
+                continue
+            for _ in range(5):
+                word = ''.join(rng.choice('abce]x ')
+                               for _ in range(rng.randint(0, 6)))
+                if compiled.pattern.search(word):
+                    self.assertTrue(compiled.can_match(word, set(word)),
+                                    (rule, word))
+
+
+FILES = {
+    'a.b': ['p > b'],
+    'a.b.c': ['b > v'],
+}
+
+
+class ApplyRuleFilesTest(unittest.TestCase):
+
+    def apply(self, word, pairs, debug=0):
+        return sound_changer.apply_rule_files(word, pairs, debug, FILES.get)
+
+    def test_chain(self):
+        self.assertEqual(self.apply('apa', [['a', 'a.b.c']]), ('ava', ''))
+
+    def test_debug(self):
+        self.assertEqual(self.apply('apa', [['a', 'a.b.c']], 1),
+                         ('ava', 'a: apa\na.b: aba\na.b.c: ava'))
+
+    def test_debug_without_stages(self):
+        # a pair from a language to itself has no stages, but the initial
+        # word is still included, as it always has been
+        self.assertEqual(self.apply('x', [['a', 'a']], 1), ('x', 'a: x'))
+        self.assertEqual(self.apply('x', [], 1), ('x', ''))
+
+    def test_many(self):
+        words = ['apa', 'pipi', 'x']
+        self.assertEqual(
+            list(sound_changer.apply_rule_files_many(
+                words, [['a', 'a.b.c']], 1, FILES.get)),
+            [self.apply(w, [['a', 'a.b.c']], 1) for w in words])
+        self.assertEqual(
+            list(sound_changer.apply_rule_files_many(
+                iter(['x']), [['a', 'a']], 1, FILES.get)),
+            [('x', 'a: x')])
+
+
+class ApplyParallelTest(unittest.TestCase):
+
+    def test_same_as_serial(self):
+        rules = [sound_changer.CompiledRuleList(RULES),
+                 sound_changer.CompiledRuleList(['b > v'])]
+        words = ['apa', 'pipi', 'kat', 'tak', 'xax', ''] * 3
+        expected = []
+        for word in words:
+            for r in rules:
+                word = r.apply(word)
+            expected.append(word)
+        for chunk_size in [None, 1, 100]:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    sound_changer.apply_parallel(words, rules, 2, chunk_size),
+                    expected)
+
+
+class FilesTestCase(unittest.TestCase):
+    """A test case with FILES written into a temporary workers.FILE_PATH."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        os.mkdir(os.path.join(tmp.name, 'files'))
+        patch = mock.patch.object(workers, 'FILE_PATH', tmp.name)
+        patch.start()
+        self.addCleanup(patch.stop)
+        for name, lines in FILES.items():
+            self.write(name, lines, 100)
+
+    def write(self, name, lines, mtime):
+        """Writes a sound change file, and sets its modification time."""
+        filename = workers.path_to_file(name)
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.utime(filename, (mtime, mtime))
+        cache.mtimes.invalidate()
+
+
+class LoadRuleFileTest(FilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_path = workers.path_to_cache('a.b.pickle')
+
+    def compiled(self):
+        """Patches workers.text_lines, to record when files are compiled."""
+        return mock.patch.object(workers, 'text_lines',
+                                 wraps=workers.text_lines)
+
+    def test_cache_written(self):
+        rules = sound_changer.load_rule_file('a.b')
+        self.assertEqual(rules.apply('apa'), 'aba')
+        with open(self.cache_path, 'rb') as f:
+            version, mtime, _, cached = pickle.load(f)
+        self.assertEqual((version, mtime), (sound_changer.CACHE_VERSION, 100))
+        self.assertEqual(cached.lines, rules.lines)
+
+    def test_same_mtime(self):
+        sound_changer.load_rule_file('a.b')
+        # the file isn't read again if its modification time is the same
+        self.write('a.b', ['p > m'], 100)
+        self.assertEqual(sound_changer.load_rule_file('a.b').apply('apa'),
+                         'aba')
+
+    def test_same_hash(self):
+        sound_changer.load_rule_file('a.b')
+        self.write('a.b', FILES['a.b'], 200)
+        with self.compiled() as compiled:
+            rules = sound_changer.load_rule_file('a.b')
+        compiled.assert_not_called()
+        self.assertEqual(rules.apply('apa'), 'aba')
+        with open(self.cache_path, 'rb') as f:
+            self.assertEqual(pickle.load(f)[1], 200)
+
+    def test_changed(self):
+        sound_changer.load_rule_file('a.b')
+        self.write('a.b', ['p > m'], 200)
+        self.assertEqual(sound_changer.load_rule_file('a.b').apply('apa'),
+                         'ama')
+
+    def test_old_version(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'wb') as f:
+            pickle.dump((sound_changer.CACHE_VERSION - 1, 100, None, None), f)
+        self.assertEqual(sound_changer.load_rule_file('a.b').apply('apa'),
+                         'aba')
+
+    def test_write_fails(self):
+        with mock.patch.object(pickle, 'dump',
+                               side_effect=pickle.PicklingError):
+            rules = sound_changer.load_rule_file('a.b')
+        self.assertEqual(rules.apply('apa'), 'aba')
+        # no partly written files are left behind
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_path)), [])
+
+
+class SoundChangeCacheTest(FilesTestCase):
+
+    def test_apply(self):
+        c = sound_changer.SoundChangeCache()
+        self.assertEqual(c('apa', (('a', 'a.b.c'),)), 'ava')
+        self.assertEqual(c('apa', (('a', 'a.b'),)), 'aba')
+        self.assertEqual(c('apa', ()), 'apa')
+
+    def test_shared_stages(self):
+        c = sound_changer.SoundChangeCache()
+        c('apa', (('a', 'a.b.c'),))
+        # the first step of the chain was already applied to this word
+        c('apa', (('a', 'a.b'),))
+        # and the second step to this one
+        c('aba', (('a.b', 'a.b.c'),))
+        stats = c.stage_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_modified(self):
+        c = sound_changer.SoundChangeCache()
+        self.assertEqual(c('apa', (('a', 'a.b.c'),)), 'ava')
+        self.write('a.b.c', ['b > m'], 200)
+        self.assertEqual(c('apa', (('a', 'a.b.c'),)), 'ama')
+        # the unchanged step is still cached
+        stats = c.stage_cache.stats()
+        self.assertEqual((stats['hits'], stats['stale']), (1, 1))
+
+    def test_shared_path(self):
+        shared_path = os.path.join(workers.FILE_PATH, 'shared.sqlite')
+        first = sound_changer.SoundChangeCache(shared_path=shared_path)
+        second = sound_changer.SoundChangeCache(shared_path=shared_path)
+        self.assertEqual(first('apa', (('a', 'a.b.c'),)), 'ava')
+        self.assertEqual(second('apa', (('a', 'a.b.c'),)), 'ava')
+        # the result computed by the first cache was used
+        self.assertEqual(second.file_cache.stats()['misses'], 0)
+        self.write('a.b.c', ['b > m'], 200)
+        self.assertEqual(second('apa', (('a', 'a.b.c'),)), 'ama')
+
+
+if __name__ == '__main__':
+    unittest.main()